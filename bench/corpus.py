@@ -0,0 +1,82 @@
+"""Deterministic synthetic wallpaper corpus for benchmarks."""
+import os
+import json
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+KINDS = ("solid", "gradient", "texture")
+FORMATS = ("png", "jpg", "webp")
+RESOLUTIONS = ((1280, 720), (1920, 1080), (2560, 1440), (3840, 2160))
+MANIFEST = "corpus.json"
+
+
+def _solid(rng, w, h):
+    color = tuple(int(c) for c in rng.integers(0, 256, 3))
+    img = Image.new("RGB", (w, h), color)
+    # A faint vignette so encoders do not collapse the file to nothing
+    draw = ImageDraw.Draw(img)
+    shade = tuple(max(0, c - 12) for c in color)
+    draw.rectangle((0, 0, w - 1, h // 12), fill=shade)
+    return img
+
+
+def _gradient(rng, w, h):
+    a, b = rng.integers(0, 256, (2, 3)).astype(np.float32)
+    angle = rng.uniform(0, np.pi)
+    x = np.linspace(0, 1, w, dtype=np.float32)[None, :]
+    y = np.linspace(0, 1, h, dtype=np.float32)[:, None]
+    t = np.clip(np.cos(angle) * x + np.sin(angle) * y, 0, 1)[..., None]
+    return Image.fromarray((a * (1 - t) + b * t).astype(np.uint8))
+
+
+def _texture(rng, w, h):
+    """Photo-like: a dominant hue, blobs of other colors and grain."""
+    base = rng.integers(0, 256, 3)
+    small = rng.normal(base, 40, (h // 32 + 1, w // 32 + 1, 3))
+    img = Image.fromarray(np.clip(small, 0, 255).astype(np.uint8)).resize((w, h), Image.Resampling.BICUBIC)
+    draw = ImageDraw.Draw(img)
+    for _ in range(int(rng.integers(3, 12))):
+        x0, y0 = int(rng.integers(0, w)), int(rng.integers(0, h))
+        r = int(rng.integers(h // 20, h // 4))
+        draw.ellipse((x0 - r, y0 - r, x0 + r, y0 + r), fill=tuple(int(c) for c in rng.integers(0, 256, 3)))
+    img = img.filter(ImageFilter.GaussianBlur(2))
+    grain = rng.normal(0, 8, (h, w, 1)).astype(np.float32)
+    return Image.fromarray(np.clip(np.asarray(img, dtype=np.float32) + grain, 0, 255).astype(np.uint8))
+
+
+_MAKERS = {"solid": _solid, "gradient": _gradient, "texture": _texture}
+
+
+def generate_corpus(directory, count=48, seed=0, resolutions=RESOLUTIONS):
+    """Write `count` images to `directory` and return their file names.
+
+    The same (count, seed, resolutions) always produces the same files; an
+    existing corpus with a matching manifest is reused as is.
+    """
+    spec = {"count": count, "seed": seed, "resolutions": [list(r) for r in resolutions]}
+    manifest = os.path.join(directory, MANIFEST)
+    try:
+        with open(manifest, "r", encoding="utf-8") as f:
+            existing = json.load(f)
+        if existing["spec"] == spec and all(os.path.exists(os.path.join(directory, n)) for n in existing["files"]):
+            return existing["files"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    files = []
+    for i in range(count):
+        kind = KINDS[i % len(KINDS)]
+        fmt = FORMATS[(i // len(KINDS)) % len(FORMATS)]
+        w, h = resolutions[i % len(resolutions)]
+        img = _MAKERS[kind](rng, w, h)
+
+        name = f"{i:04d}_{kind}_{w}x{h}.{fmt}"
+        options = {"quality": 90} if fmt in ("jpg", "webp") else {}
+        img.save(os.path.join(directory, name), **options)
+        files.append(name)
+
+    with open(manifest, "w", encoding="utf-8") as f:
+        json.dump({"spec": spec, "files": files}, f, indent=2)
+    return files
@@ -0,0 +1,215 @@
+"""Throughput benchmarks for the decode, clustering, classification and sorting stages.
+
+    python -m bench --count 48 --save baseline.json
+    python -m bench --baseline baseline.json   # exit code 1 on a regression
+    python -m bench --stages startup           # exit code 1 over the import budget
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+
+import numpy as np
+
+from bench.corpus import generate_corpus
+from bench.startup import check_startup
+from core import ENGINES, load_pixels, colors_from_pixels, classify_color, classify_colors
+from pipeline import ACCURACY_PRESETS, SortJob, accuracy_settings_for, default_worker_count
+
+STAGES = ("decode", "cluster", "classify", "sort", "startup")
+CORPUS_STAGES = ("decode", "cluster", "sort")
+CLASSIFY_SAMPLES = 20000
+DEFAULT_TOLERANCE = 0.15
+
+
+def default_corpus_dir():
+    return os.path.join(tempfile.gettempdir(), "prismpaper-bench")
+
+
+def _best(fn, repeat):
+    """Fastest of `repeat` runs, in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _entry(items, seconds):
+    return {"items": items, "seconds": round(seconds, 4), "per_sec": round(items / seconds, 2) if seconds else None}
+
+
+# --------------------- STAGES ---------------------
+def bench_decode(paths, presets, repeat):
+    results = {}
+    for sample_size in sorted({ACCURACY_PRESETS[p]["sample_size"] for p in presets}):
+        seconds = _best(lambda: [load_pixels(p, sample_size) for p in paths], repeat)
+        results[f"decode/{sample_size}px"] = _entry(len(paths), seconds)
+    return results
+
+
+def bench_cluster(paths, presets, engines, repeat):
+    results = {}
+    for preset in presets:
+        settings = ACCURACY_PRESETS[preset]
+        pixels = np.stack([load_pixels(p, settings["sample_size"]) for p in paths])
+        for engine in engines:
+            options = accuracy_settings_for(preset, engine)
+            seconds = _best(lambda: colors_from_pixels(pixels, **options), repeat)
+            results[f"cluster/{preset}/{engine}"] = _entry(len(paths), seconds)
+    return results
+
+
+def bench_classify(repeat):
+    rgb = np.random.default_rng(0).integers(0, 256, (CLASSIFY_SAMPLES, 3)).astype(np.float64)
+    scalar = _best(lambda: [classify_color(c) for c in rgb], repeat)
+    vectorized = _best(lambda: classify_colors(rgb), repeat)
+    return {
+        "classify/scalar": _entry(len(rgb), scalar),
+        "classify/batch": _entry(len(rgb), vectorized),
+    }
+
+
+def bench_sort(corpus_dir, files, presets, engines, workers, repeat, staged=False):
+    """End-to-end SortJob runs (the engine behind SortWorker and the CLI)."""
+    results = {}
+    output = tempfile.mkdtemp(prefix="prismpaper-bench-out-")
+    try:
+        for preset in presets:
+            for engine in engines:
+                for count in workers:
+                    def run():
+                        shutil.rmtree(output, ignore_errors=True)
+                        job = SortJob(
+                            corpus_dir, output, True, list(files), ["All Colors"],
+                            low_power_mode=False,
+                            accuracy_settings=accuracy_settings_for(preset, engine),
+                            min_workers=count, max_workers=count, staged=staged, placement="copy",
+                        )
+                        summary = job.run()
+                        if summary["failed"]:
+                            raise RuntimeError(f"{summary['failed']} file(s) failed: {summary['errors'][:3]}")
+
+                    seconds = _best(run, repeat)
+                    results[f"sort/{preset}/{engine}/{count}w" + ("/staged" if staged else "")] = _entry(len(files), seconds)
+    finally:
+        shutil.rmtree(output, ignore_errors=True)
+    return results
+
+
+# --------------------- BASELINE ---------------------
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Ratio of current to baseline throughput for every benchmark both ran."""
+    comparison = {}
+    for name, entry in results.items():
+        old = baseline.get(name)
+        if not old or not old.get("per_sec") or not entry.get("per_sec"):
+            continue
+        ratio = entry["per_sec"] / old["per_sec"]
+        comparison[name] = {
+            "baseline": old["per_sec"],
+            "current": entry["per_sec"],
+            "ratio": round(ratio, 3),
+            "regression": ratio < 1 - tolerance,
+        }
+    return comparison
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+
+
+# --------------------- MAIN ---------------------
+def _list(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m bench", description="PrismPaper throughput benchmarks.")
+    parser.add_argument("--corpus", default=default_corpus_dir(), help="where the synthetic corpus is generated")
+    parser.add_argument("--count", type=int, default=48, help="number of corpus images")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", type=_list, default=list(STAGES), help=f"comma separated subset of {','.join(STAGES)}")
+    parser.add_argument("--presets", type=_list, default=list(ACCURACY_PRESETS))
+    parser.add_argument("--engines", type=_list, default=list(ENGINES))
+    parser.add_argument("--workers", type=lambda v: [int(w) for w in _list(v)], default=None,
+                        help="worker counts for the sort stage (default: 1 and the performance default)")
+    parser.add_argument("--staged", action="store_true", help="also time the staged sort pipeline")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, the fastest counts")
+    parser.add_argument("--baseline", help="compare against a JSON report saved earlier")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown before a benchmark counts as a regression")
+    parser.add_argument("--save", help="also write the report to this file")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    unknown = set(args.stages) - set(STAGES) | set(args.presets) - set(ACCURACY_PRESETS) | set(args.engines) - set(ENGINES)
+    if unknown:
+        print(f"Unknown stage, preset or engine: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    workers = args.workers or sorted({1, default_worker_count(False)})
+
+    files = paths = []
+    if any(stage in CORPUS_STAGES for stage in args.stages):
+        files = generate_corpus(args.corpus, args.count, args.seed)
+        paths = [os.path.join(args.corpus, f) for f in files]
+
+    results = {}
+    startup = None
+    if "startup" in args.stages:
+        startup = check_startup(args.repeat)
+        for name, entry in startup.items():
+            results[f"startup/{name}"] = _entry(1, entry["seconds"])
+    if "decode" in args.stages:
+        results.update(bench_decode(paths, args.presets, args.repeat))
+    if "cluster" in args.stages:
+        results.update(bench_cluster(paths, args.presets, args.engines, args.repeat))
+    if "classify" in args.stages:
+        results.update(bench_classify(args.repeat))
+    if "sort" in args.stages:
+        results.update(bench_sort(args.corpus, files, args.presets, args.engines, workers, args.repeat))
+        if args.staged:
+            results.update(bench_sort(args.corpus, files, args.presets, args.engines, workers, args.repeat, staged=True))
+
+    report = {
+        "environment": environment(),
+        "corpus": {"count": args.count, "seed": args.seed},
+        "results": results,
+    }
+
+    status = 0
+    if startup is not None:
+        report["startup"] = startup
+        if not all(entry["ok"] for entry in startup.values()):
+            status = 1
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["comparison"] = compare(results, baseline.get("results", {}), args.tolerance)
+        regressions = sorted(n for n, c in report["comparison"].items() if c["regression"])
+        report["regressions"] = regressions
+        status = 1 if regressions else status
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return status
@@ -0,0 +1,56 @@
+"""Cold-start import budget for the GUI and CLI entry points."""
+import os
+import sys
+import json
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What each entry point imports before it can show something, and its budget in seconds
+ENTRY_POINTS = {
+    "gui": ("import ui.splash, ui.app_gui, ui.window", 1.5),
+    "cli": ("import cli", 0.3),
+    "engine": ("import pipeline", 2.0),
+}
+# Must stay out of the GUI and CLI startup path; sklearn also out of the engine's
+HEAVY_MODULES = ("numpy", "PIL", "psutil", "sklearn", "scipy")
+ENGINE_HEAVY_MODULES = ("sklearn", "scipy")
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(statement, repeat=3):
+    """Fastest import time of `statement` in a fresh interpreter, and the heavy modules it loaded."""
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    best = None
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(statement=statement, heavy=HEAVY_MODULES)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        sample = json.loads(out.strip().splitlines()[-1])
+        if best is None or sample["seconds"] < best["seconds"]:
+            best = sample
+    return best
+
+
+def check_startup(repeat=3):
+    """{entry point: {"seconds", "budget", "heavy", "ok"}} for every entry point."""
+    report = {}
+    for name, (statement, budget) in ENTRY_POINTS.items():
+        sample = measure(statement, repeat)
+        forbidden = ENGINE_HEAVY_MODULES if name == "engine" else HEAVY_MODULES
+        heavy = [m for m in sample["modules"] if m in forbidden]
+        report[name] = {
+            "seconds": round(sample["seconds"], 4),
+            "budget": budget,
+            "heavy": heavy,
+            "ok": sample["seconds"] <= budget and not heavy,
+        }
+    return report
@@ -0,0 +1,161 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+
+DEFAULT_MAX_ENTRIES = 500_000
+TOUCH_INTERVAL = 24 * 3600  # only refresh an entry's timestamp once a day
+
+
+def default_cache_path():
+    """Per-user location of the color cache database."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "PrismPaper", "colors.sqlite3")
+
+
+def settings_key(settings):
+    """Short stable digest of an accuracy-settings dict."""
+    blob = json.dumps(settings or {}, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(blob.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _dump_palette(palette):
+    if palette is None:
+        return None
+    return json.dumps([[round(c, 2) for c in rgb] + [round(share, 4)] for rgb, share in palette],
+                      separators=(",", ":"))
+
+
+def _load_palette(text):
+    if text is None:
+        return None
+    return [(tuple(entry[:3]), entry[3]) for entry in json.loads(text)]
+
+
+class ColorCache:
+    """Persistent dominant-color cache backed by SQLite.
+
+    Entries are keyed by absolute path and accuracy settings; the file size and
+    mtime are stored alongside and must match for a lookup to hit, so edited or
+    replaced files are re-analysed automatically. The table is bounded by
+    `max_entries` and `prune()` drops the least recently used rows. The
+    palette of each file (see core.palettes_from_pixels) is kept as JSON;
+    rows written before palettes were stored have none.
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path or default_cache_path()
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS colors (
+                path TEXT NOT NULL,
+                settings TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime INTEGER NOT NULL,
+                r REAL, g REAL, b REAL,
+                class TEXT NOT NULL,
+                used REAL NOT NULL,
+                palette TEXT,
+                PRIMARY KEY (path, settings)
+            )"""
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(colors)")]
+        if "palette" not in columns:
+            self._conn.execute("ALTER TABLE colors ADD COLUMN palette TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS colors_used ON colors (used)")
+
+    # ---------- LOOKUP ----------
+    def get(self, path, st, settings):
+        """Return (rgb, class_name, palette) for an unchanged file, else None.
+
+        `st` is the os.stat() result of `path`; `rgb` is None for files that
+        could not be decoded, `palette` a [(rgb, share), ...] list or None.
+        """
+        key = settings if isinstance(settings, str) else settings_key(settings)
+        row = self._conn.execute(
+            "SELECT size, mtime, r, g, b, class, used, palette FROM colors WHERE path = ? AND settings = ?",
+            (os.path.abspath(path), key),
+        ).fetchone()
+        if row is None:
+            return None
+
+        size, mtime, r, g, b, class_name, used, palette = row
+        if size != st.st_size or mtime != st.st_mtime_ns:
+            return None
+
+        now = time.time()
+        if now - used > TOUCH_INTERVAL:
+            self._conn.execute(
+                "UPDATE colors SET used = ? WHERE path = ? AND settings = ?",
+                (now, os.path.abspath(path), key),
+            )
+
+        rgb = None if r is None else (r, g, b)
+        return rgb, class_name, _load_palette(palette)
+
+    def put(self, path, st, settings, rgb, class_name, palette=None):
+        key = settings if isinstance(settings, str) else settings_key(settings)
+        r, g, b = (None, None, None) if rgb is None else (float(c) for c in rgb)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO colors VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (os.path.abspath(path), key, st.st_size, st.st_mtime_ns, r, g, b, class_name, time.time(),
+             _dump_palette(palette)),
+        )
+
+    def entries(self, path=None):
+        """Yield (path, size, mtime, rgb, palette) of every decoded file, or only those under `path`.
+
+        A file analysed with several accuracy settings comes once per
+        setting, the most recently used last.
+        """
+        query = "SELECT path, size, mtime, r, g, b, palette FROM colors WHERE r IS NOT NULL"
+        params = ()
+        if path is not None:
+            path = os.path.abspath(path)
+            prefix = path.rstrip(os.sep) + os.sep
+            query += " AND (path = ? OR substr(path, 1, ?) = ?)"
+            params = (path, len(prefix), prefix)
+        for path, size, mtime, r, g, b, palette in self._conn.execute(query + " ORDER BY used", params):
+            yield path, size, mtime, (r, g, b), _load_palette(palette)
+
+    # ---------- MAINTENANCE ----------
+    def prune(self):
+        """Evict least recently used entries above `max_entries`."""
+        count = self._conn.execute("SELECT COUNT(*) FROM colors").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM colors WHERE rowid IN (SELECT rowid FROM colors ORDER BY used ASC LIMIT ?)",
+                (excess,),
+            )
+        return max(0, excess)
+
+    def invalidate(self, path=None):
+        """Forget cached colors for a file or folder, or everything if `path` is None."""
+        if path is None:
+            self._conn.execute("DELETE FROM colors")
+            self._conn.execute("VACUUM")
+            return
+
+        path = os.path.abspath(path)
+        prefix = path.rstrip(os.sep) + os.sep
+        self._conn.execute(
+            "DELETE FROM colors WHERE path = ? OR substr(path, 1, ?) = ?",
+            (path, len(prefix), prefix),
+        )
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM colors").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,365 @@
+"""PrismPaper command-line interface.
+
+Runs the same sorting pipeline as the GUI without importing PyQt, so it
+works on headless machines, from cron and in batch jobs:
+
+    python main.py sort ~/Wallpapers ~/Sorted --colors Red,Blue --accuracy High --json
+    python main.py watch ~/Inbox ~/Sorted --move
+    python main.py query "#ff8800" --top 20
+"""
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+
+COLOR_CHOICES = ["Red", "Orange", "Yellow", "Green", "Cyan", "Blue", "Purple", "Pink", "Black", "White", "Gray", "Mixed"]
+ENGINE_CHOICES = ["auto", "sklearn", "batched", "histogram"]
+PLACEMENT_CHOICES = ["auto", "copy", "reflink", "hardlink", "symlink"]
+COMMANDS = ("sort", "watch", "cache", "index", "query")
+
+
+# --------------------- ARGUMENTS ---------------------
+def _color_list(value):
+    colors = [c.strip().capitalize() for c in value.split(",") if c.strip()]
+    unknown = [c for c in colors if c not in COLOR_CHOICES]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown color(s): {', '.join(unknown)} (choose from {', '.join(COLOR_CHOICES)})"
+        )
+    return colors
+
+
+def _add_sort_arguments(sort):
+    sort.add_argument("input", help="folder containing the images")
+    sort.add_argument("output", help="folder receiving one sub-folder per color")
+    sort.add_argument("--move", action="store_true", help="move files instead of copying them")
+    sort.add_argument("--placement", choices=PLACEMENT_CHOICES, default="auto",
+                      help="how copies are written: auto clones copy-on-write where supported and "
+                           "falls back to a full copy; hardlink/symlink use no extra space")
+    sort.add_argument("-r", "--recursive", action="store_true", help="also sort images in sub-folders")
+    sort.add_argument("--include", action="append", metavar="GLOB",
+                      help="only sort files matching this pattern (repeatable)")
+    sort.add_argument("--exclude", action="append", metavar="GLOB",
+                      help="skip files and folders matching this pattern (repeatable)")
+    sort.add_argument("--flatten", action="store_true",
+                      help="put files from sub-folders directly in the color folders")
+    sort.add_argument("--colors", type=_color_list, default=None,
+                      help="comma separated colors to extract (default: all)")
+    sort.add_argument("--accuracy", choices=["low", "normal", "high"], default="normal")
+    sort.add_argument("--engine", choices=ENGINE_CHOICES, default="auto",
+                      help="clustering engine (default: chosen by the accuracy preset)")
+    sort.add_argument("--mode", choices=["auto", "performance", "low-power"], default="auto")
+    sort.add_argument("--workers", type=int, default=None,
+                      help="fixed number of worker processes (default: adapt to the system load)")
+    sort.add_argument("--max-workers", type=int, default=None,
+                      help="upper bound for the adaptive worker count (default: all cores but one)")
+    sort.add_argument("--min-workers", type=int, default=None, help="lower bound for the adaptive worker count")
+    sort.add_argument("--staged", action="store_true",
+                      help="overlap reading/decoding and file placement with clustering (slow disks, NAS)")
+    sort.add_argument("--duplicates", choices=["report", "skip"], default=None,
+                      help="analyse exact (and, with --staged, near) duplicates only once; "
+                           "report them or leave them out of the output")
+    sort.add_argument("--prefilter", choices=["strict", "fast", "off"], default="strict",
+                      help="with --colors, skip clustering images that cannot match them; strict never "
+                           "skips a match, fast also skips images with few pixels of those colors")
+    sort.add_argument("--secondary", choices=["place", "manifest"], default=None,
+                      help="also put images in the folder of a second color covering --secondary-share "
+                           "of them (place), or list those colors in prismpaper-secondary.json (manifest)")
+    sort.add_argument("--secondary-share", type=float, default=0.25, metavar="SHARE",
+                      help="share of an image a second color needs (default: 0.25)")
+    sort.add_argument("--max-megapixels", type=float, default=64, metavar="MP",
+                      help="fail images larger than this instead of decoding them (0: no limit)")
+    sort.add_argument("--file-timeout", type=float, default=30, metavar="SECONDS",
+                      help="fail a file whose decoding takes longer than this (0: no limit)")
+    sort.add_argument("--worker-memory", type=int, default=2048, metavar="MB",
+                      help="restart worker processes using more memory than this (0: no limit)")
+    sort.add_argument("--no-cache", action="store_true", help="ignore the persistent color cache")
+    sort.add_argument("--no-resume", action="store_true",
+                      help="start over instead of skipping files an interrupted run of this job already sorted")
+    sort.add_argument("--json", action="store_true", help="print the run summary as JSON on stdout")
+    sort.add_argument("--report", metavar="PATH", default=None,
+                      help="write the run summary with per-stage timing histograms to this JSON file")
+    sort.add_argument("--slowest", type=int, default=0, metavar="N", help="list the N slowest files")
+    sort.add_argument("--profile", metavar="PATH", default=None,
+                      help="run one worker under cProfile and write its stats to PATH")
+    sort.add_argument("-q", "--quiet", action="store_true", help="do not report progress on stderr")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="prismpaper", description="Sort wallpapers by dominant color.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sort = commands.add_parser("sort", help="sort a folder of images into color folders")
+    _add_sort_arguments(sort)
+
+    watch = commands.add_parser("watch", help="keep sorting images as they arrive in a folder, until Ctrl+C")
+    _add_sort_arguments(watch)
+    watch.add_argument("--poll", action="store_true",
+                       help="list the folder every second instead of using inotify (network shares)")
+
+    cache = commands.add_parser("cache", help="inspect or reset the color cache")
+    cache.add_argument("action", choices=["info", "prune", "clear"])
+    cache.add_argument("--path", default=None, help="only clear entries under this file or folder")
+
+    index = commands.add_parser("index", help="build the color search index from the color cache")
+    index.add_argument("action", choices=["build", "info"])
+    index.add_argument("--path", default=None, help="only index images under this file or folder")
+    index.add_argument("--index", metavar="FILE", default=None, help="index file (default: next to the cache)")
+    index.add_argument("--fresh", action="store_true",
+                       help="start over instead of keeping images of the previous index that left the cache")
+
+    query = commands.add_parser("query", help="find analysed images by color, without decoding them")
+    query.add_argument("color", help="#rrggbb, #rgb or r,g,b")
+    query.add_argument("-n", "--top", type=int, default=None,
+                       help="number of closest images (default: 50, with --within: all)")
+    query.add_argument("--within", type=float, metavar="DELTA_E", default=None,
+                       help="all images within this CIELAB distance instead (about 2: barely visible, 10: similar)")
+    query.add_argument("--palette", action="store_true",
+                       help="also match palette colors, not only the dominant color of each image")
+    query.add_argument("--min-share", type=float, default=0.1, metavar="SHARE",
+                       help="with --palette, smallest share of the image a matching color must cover (default: 0.1)")
+    query.add_argument("--index", metavar="FILE", default=None, help="index file (default: next to the cache)")
+    query.add_argument("--json", action="store_true", help="print the matches as JSON")
+
+    return parser
+
+
+# --------------------- PROGRESS ---------------------
+def _progress_printer(quiet, interval=0.5):
+    """Progress callback writing to stderr, rate limited to one line per `interval`."""
+    if quiet:
+        return None
+
+    interactive = sys.stderr.isatty()
+    last = [0.0]
+
+    def report(processed, total):
+        now = time.monotonic()
+        if processed < total and now - last[0] < interval:
+            return
+        last[0] = now
+        line = f"[{processed / total * 100:5.1f}%] {processed}/{total} files"
+        if interactive:
+            sys.stderr.write("\r" + line + ("\n" if processed == total else ""))
+        else:
+            sys.stderr.write(line + "\n")
+        sys.stderr.flush()
+
+    return report
+
+
+def _print_summary(summary):
+    print(f"Processed {summary['processed']}/{summary['total']} files in {summary['elapsed']:.1f}s "
+          f"({summary['placed']} placed, {summary['skipped']} skipped, {summary['failed']} failed)")
+    if summary["resumed"]:
+        print(f"  {summary['resumed']} of them were already done by an interrupted run")
+    if summary["retried"]:
+        print(f"  {summary['retried']} retried after a worker process died")
+    if summary["stats"]["filtered"]:
+        print(f"  {summary['stats']['filtered']} skipped without clustering by the color prefilter")
+    for name, count in sorted(summary["classes"].items(), key=lambda item: -item[1]):
+        print(f"  {name:<8} {count}")
+    if summary["secondary"]:
+        counts = sorted(summary["secondary"].items(), key=lambda item: -item[1])
+        print("  secondary colors: " + ", ".join(f"{name} {count}" for name, count in counts))
+    if summary["duplicates"]:
+        print(f"{len(summary['duplicates'])} duplicate(s):")
+        for dup in summary["duplicates"][:20]:
+            print(f"  = {dup['file']} ({dup['kind']} copy of {dup['of']})")
+    for error in summary["errors"][:20]:
+        print(f"  ! {error['file']}: {error['error']}")
+
+    stats = summary["stats"]
+    if stats["files"]:
+        print(f"Stage times in ms (read {stats['bytes_read'] / 1e6:.1f} MB, wrote {stats['bytes_written'] / 1e6:.1f} MB):")
+        for stage, s in stats["stages"].items():
+            if s["count"]:
+                print(f"  {stage:<8} p50 {s['p50'] * 1000:8.2f}  p95 {s['p95'] * 1000:8.2f}  "
+                      f"p99 {s['p99'] * 1000:8.2f}  total {s['total']:.2f}s")
+    for slow in summary["slowest"]:
+        print(f"  ~ {slow['file']}: {slow['total'] * 1000:.0f} ms")
+
+
+# --------------------- COMMANDS ---------------------
+def cmd_sort(args):
+    from pipeline import SortJob, accuracy_settings_for
+    from scanner import ScanSource
+    from pool import WarmPool
+    from cache import default_cache_path
+    from journal import default_journal_dir
+
+    if not os.path.isdir(args.input):
+        print(f"prismpaper: input folder not found: {args.input}", file=sys.stderr)
+        return 2
+    os.makedirs(args.output, exist_ok=True)
+
+    watching = args.command == "watch"
+    if watching:
+        from watcher import WatchSource
+
+        files = WatchSource(args.input, recursive=args.recursive, include=args.include,
+                            exclude=args.exclude, skip_dirs=[args.output], poll=args.poll)
+    else:
+        files = ScanSource(args.input, recursive=args.recursive, include=args.include,
+                           exclude=args.exclude, skip_dirs=[args.output])
+    target_colors = args.colors or ["All Colors"]
+    low_power = {"auto": None, "performance": False, "low-power": True}[args.mode]
+    engine = None if args.engine == "auto" else args.engine
+    accuracy_settings = accuracy_settings_for(args.accuracy.capitalize(), engine)
+    # A watch keeps its workers up between arrivals, so a new file does not wait for them to start
+    pool = WarmPool() if watching else None
+
+    job = SortJob(
+        args.input,
+        args.output,
+        not args.move,
+        files,
+        target_colors,
+        low_power_mode=low_power,
+        accuracy_settings=accuracy_settings,
+        cache_path=None if args.no_cache else default_cache_path(),
+        min_workers=args.workers or args.min_workers,
+        max_workers=args.workers or args.max_workers,
+        mirror=not args.flatten,
+        staged=args.staged,
+        placement=args.placement,
+        duplicates=args.duplicates,
+        prefilter=None if args.prefilter == "off" else args.prefilter,
+        secondary=args.secondary,
+        secondary_share=args.secondary_share,
+        max_pixels=int(args.max_megapixels * 1e6),
+        file_timeout=args.file_timeout or None,
+        worker_memory=args.worker_memory * 1024**2,
+        report_path=args.report,
+        slowest=args.slowest,
+        profile_path=args.profile,
+        journal_dir=default_journal_dir(),
+        resume=not args.no_resume,
+        pool=pool,
+        on_progress=_progress_printer(args.quiet),
+        on_status=None if args.quiet else (lambda msg: print(msg, file=sys.stderr)),
+    )
+
+    # First Ctrl+C finishes the files in flight and stops, a second one aborts
+    def interrupt(signum, frame):
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        print("\nStopping after the files in flight...", file=sys.stderr)
+        job.stop()
+
+    signal.signal(signal.SIGINT, interrupt)
+    if pool is not None:
+        pool.start(job.max_workers)
+        if not args.quiet:
+            # The watcher settles on inotify or polling once run() has started it
+            def announce():
+                files.ready.wait()
+                print(f"Watching {args.input}{' (polling)' if files.polling else ''}, Ctrl+C to stop", file=sys.stderr)
+
+            threading.Thread(target=announce, daemon=True).start()
+    try:
+        summary = job.run()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if args.json:
+        json.dump(summary, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        _print_summary(summary)
+
+    return 1 if summary["failed"] else 0
+
+
+def cmd_cache(args):
+    from cache import ColorCache
+
+    cache = ColorCache()
+    try:
+        if args.action == "clear":
+            cache.invalidate(args.path)
+            print("Color cache cleared" + (f" for {args.path}" if args.path else ""))
+        elif args.action == "prune":
+            print(f"Evicted {cache.prune()} entries")
+        else:
+            print(f"{cache.path}: {len(cache)} entries (limit {cache.max_entries})")
+    finally:
+        cache.close()
+    return 0
+
+
+def cmd_index(args):
+    from colorindex import ColorIndex
+
+    if args.action == "build":
+        start = time.perf_counter()
+        previous = None
+        if not args.fresh:
+            try:
+                previous = ColorIndex.load(args.index)
+            except (OSError, ValueError):
+                pass
+        index = ColorIndex.from_cache(path=args.path, previous=previous)
+        path = index.save(args.index)
+        print(f"Indexed {len(index)} images in {time.perf_counter() - start:.1f}s: {path}")
+        return 0
+
+    try:
+        index = ColorIndex.load(args.index)
+    except (OSError, ValueError) as e:
+        print(f"prismpaper: no usable color index ({e}); run 'index build' first", file=sys.stderr)
+        return 2
+    print(f"{len(index)} images, {len(index.lab)} colors, grid step {index.step:g}")
+    return 0
+
+
+def cmd_query(args):
+    from colorindex import ColorIndex, parse_color
+
+    try:
+        color = parse_color(args.color)
+    except ValueError as e:
+        print(f"prismpaper: {e}", file=sys.stderr)
+        return 2
+    try:
+        index = ColorIndex.load(args.index)
+    except (OSError, ValueError) as e:
+        print(f"prismpaper: no usable color index ({e}); run 'index build' first", file=sys.stderr)
+        return 2
+
+    if args.within is not None:
+        matches = index.within(color, args.within, args.top, args.palette, args.min_share)
+    else:
+        matches = index.nearest(color, args.top or 50, args.palette, args.min_share)
+
+    if args.json:
+        json.dump([{"file": path, "rgb": list(rgb), "delta_e": round(d, 2)} for path, rgb, d in matches],
+                  sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        for path, rgb, d in matches:
+            print(f"{d:6.2f}  #{rgb[0]:02x}{rgb[1]:02x}{rgb[2]:02x}  {path}")
+    return 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command in ("sort", "watch"):
+        return cmd_sort(args)
+    if args.command == "index":
+        return cmd_index(args)
+    if args.command == "query":
+        return cmd_query(args)
+    return cmd_cache(args)
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
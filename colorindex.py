@@ -0,0 +1,261 @@
+"""Color search over analysed images without decoding them again.
+
+Colors are kept in CIELAB, where the Euclidean distance (CIE76 delta E)
+follows the perceived difference, in flat NumPy arrays saved as a single
+.npz file. Rows are sorted into a uniform grid of `step` delta E cells, so
+a query only measures the rows of the few cells around the query color.
+Each image has a row for its dominant color and, when its palette is
+known, one for each other palette color with the share it covers; results
+list every image once, at the distance of its closest row.
+
+The index is built from the color cache, which only holds images sorted
+with the cache on and keeps up to cache.DEFAULT_MAX_ENTRIES of them. So
+that pruned or cleared cache rows do not drop out of the search, each
+build also keeps the images of the previous index that are unchanged
+on disk.
+"""
+import os
+import re
+import numpy as np
+
+from cache import ColorCache, default_cache_path
+
+INDEX_VERSION = 3
+GRID_STEP = 4.0  # delta E spanned by a grid cell
+MAX_DELTA_E = 400.0  # beyond the distance between any two Lab colors
+_AB_MIN = -128.0
+
+# sRGB (D65) to XYZ, and the D65 white point
+_RGB_TO_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+])
+_WHITE = np.array([0.95047, 1.0, 1.08883])
+
+
+def default_index_path():
+    return os.path.join(os.path.dirname(default_cache_path()), "colors-index.npz")
+
+
+def parse_color(value):
+    """(r, g, b) from "#ff8800", "f80" or "255,136,0"."""
+    text = value.strip()
+    if "," in text:
+        rgb = tuple(float(c) for c in text.split(","))
+        if len(rgb) != 3 or not all(0 <= c <= 255 for c in rgb):
+            raise ValueError(f"expected three values from 0 to 255: {value}")
+        return rgb
+    hex_digits = text.lstrip("#")
+    if len(hex_digits) == 3:
+        hex_digits = "".join(c * 2 for c in hex_digits)
+    if not re.fullmatch(r"[0-9a-fA-F]{6}", hex_digits):
+        raise ValueError(f"not a #rrggbb or r,g,b color: {value}")
+    return tuple(float(int(hex_digits[i:i + 2], 16)) for i in (0, 2, 4))
+
+
+def rgb_to_lab(rgb):
+    """CIELAB (D65) of (..., 3) sRGB values on the 0-255 scale."""
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = linear @ _RGB_TO_XYZ.T / _WHITE
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[..., 1] - 16, 500 * (f[..., 0] - f[..., 1]), 200 * (f[..., 1] - f[..., 2])], axis=-1)
+
+
+# --------------------- INDEX ---------------------
+class ColorIndex:
+    """Colors of a set of images with nearest-color and radius queries.
+
+    Build one with build() or from_cache(), save() it and load() it again.
+    nearest() and within() return (path, rgb, delta_e) tuples, closest
+    first; `rgb` is the matching color of the image. They compare dominant
+    colors only, unless `palette` is set: then palette colors covering at
+    least `min_share` of an image match too.
+    """
+
+    def __init__(self, arrays):
+        self.step = float(arrays["step"])
+        self.size = arrays["size"]
+        self.mtime = arrays["mtime"]
+        self.lab = arrays["lab"]
+        self.rgb = arrays["rgb"]
+        self.image = arrays["image"]
+        self.weight = arrays["weight"]
+        self.primary = arrays["primary"]
+        self._starts = arrays["starts"]
+        self._names = arrays["names"].tobytes()
+        self._offsets = arrays["offsets"]
+        self._shape = (int(np.ceil(100 / self.step)) + 1, int(np.ceil(256 / self.step)) + 1)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    @classmethod
+    def build(cls, entries, step=GRID_STEP):
+        """Index `entries`: (path, dominant rgb, palette, signature).
+
+        `palette` is [(rgb, share), ...] or None, `signature` the (size,
+        mtime_ns) of the file when it was analysed, or None.
+        """
+        names, offsets = bytearray(), [0]
+        rgb, weight, image, primary, signatures = [], [], [], [], []
+        for path, dominant, palette, signature in entries:
+            colors = [(dominant, 1.0, True)] + [
+                (color, share, False) for color, share in palette or ()
+                if not np.allclose(color, dominant, atol=0.5)
+            ]
+            for color, share, is_primary in colors:
+                rgb.append(color)
+                weight.append(share)
+                image.append(len(offsets) - 1)
+                primary.append(is_primary)
+            names += os.fsencode(path)
+            offsets.append(len(names))
+            signatures.append(signature or (-1, -1))
+
+        rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 3)
+        lab = rgb_to_lab(rgb).astype(np.float32)
+        n_l, n_ab = int(np.ceil(100 / step)) + 1, int(np.ceil(256 / step)) + 1
+        cells = cls._cell_ids(lab, step, n_l, n_ab)
+        order = np.argsort(cells, kind="stable")
+        signatures = np.asarray(signatures, dtype=np.int64).reshape(-1, 2)
+        return cls({
+            "step": step,
+            "size": signatures[:, 0],
+            "mtime": signatures[:, 1],
+            "lab": lab[order],
+            "rgb": np.clip(np.rint(rgb[order]), 0, 255).astype(np.uint8),
+            "image": np.asarray(image, dtype=np.int32)[order],
+            "weight": np.asarray(weight, dtype=np.float32)[order],
+            "primary": np.asarray(primary, dtype=bool)[order],
+            "starts": np.searchsorted(cells[order], np.arange(n_l * n_ab * n_ab + 1)).astype(np.int64),
+            "names": np.frombuffer(bytes(names), dtype=np.uint8),
+            "offsets": np.asarray(offsets, dtype=np.int64),
+        })
+
+    @classmethod
+    def from_cache(cls, cache_path=None, path=None, step=GRID_STEP, previous=None):
+        """Index the colors and palettes in the color cache, optionally only under `path`.
+
+        Images of a `previous` index that are no longer in the cache are
+        kept. Files that were deleted or changed since they were analysed
+        are left out; of several accuracy settings, the most recently used
+        one wins.
+        """
+        cache = ColorCache(cache_path)
+        try:
+            latest = {p: (size, mtime, rgb, palette) for p, size, mtime, rgb, palette in cache.entries(path)}
+        finally:
+            cache.close()
+        if previous is not None:
+            root = path and os.path.abspath(path)
+            for p, rgb, palette, signature in previous.entries():
+                if signature and (root is None or p == root or p.startswith(root.rstrip(os.sep) + os.sep)):
+                    latest.setdefault(p, signature + (rgb, palette))
+
+        def current():
+            for p, (size, mtime, rgb, palette) in latest.items():
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                if st.st_size == size and st.st_mtime_ns == mtime:
+                    yield p, rgb, palette, (size, mtime)
+
+        return cls.build(current(), step)
+
+    def entries(self):
+        """(path, dominant rgb, palette, signature) of every image, as build() takes them."""
+        order = np.argsort(self.image, kind="stable")
+        bounds = np.searchsorted(self.image[order], np.arange(len(self) + 1))
+        for i in range(len(self)):
+            rows = order[bounds[i]:bounds[i + 1]]
+            dominant = next(tuple(float(c) for c in self.rgb[r]) for r in rows if self.primary[r])
+            palette = [(tuple(float(c) for c in self.rgb[r]), float(self.weight[r])) for r in rows if not self.primary[r]]
+            signature = (int(self.size[i]), int(self.mtime[i])) if self.size[i] >= 0 else None
+            yield self.path(i), dominant, palette, signature
+
+    # ---------- FILE ----------
+    def save(self, path=None):
+        path = path or default_index_path()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f, version=INDEX_VERSION, step=self.step, size=self.size, mtime=self.mtime,
+                lab=self.lab, rgb=self.rgb, image=self.image,
+                weight=self.weight, primary=self.primary, starts=self._starts, offsets=self._offsets,
+                names=np.frombuffer(self._names, dtype=np.uint8),
+            )
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path=None):
+        with np.load(path or default_index_path()) as data:
+            if int(data["version"]) != INDEX_VERSION:
+                raise ValueError(f"unsupported color index version {int(data['version'])}, rebuild it")
+            return cls({name: data[name] for name in data.files})
+
+    # ---------- QUERIES ----------
+    def nearest(self, color, k=50, palette=False, min_share=0.0):
+        """The `k` images closest to `color` ((r, g, b) or "#rrggbb")."""
+        lab = self._query_lab(color)
+        radius = self.step
+        while True:
+            rows, dist = self._candidates(lab, radius, palette, min_share)
+            # Rows outside the searched cells are all further away than `radius`
+            if np.unique(self.image[rows[dist <= radius]]).size >= k or radius >= MAX_DELTA_E:
+                break
+            radius *= 2
+        return self._results(rows, dist, k)
+
+    def within(self, color, delta_e, limit=None, palette=False, min_share=0.0):
+        """Images with a color within `delta_e` of `color`, closest first."""
+        rows, dist = self._candidates(self._query_lab(color), delta_e, palette, min_share)
+        keep = dist <= delta_e
+        return self._results(rows[keep], dist[keep], limit)
+
+    def path(self, image):
+        return os.fsdecode(self._names[self._offsets[image]:self._offsets[image + 1]])
+
+    # ---------- HELPER ----------
+    @staticmethod
+    def _cell_ids(lab, step, n_l, n_ab):
+        l_cell = np.clip((lab[..., 0] // step).astype(np.int64), 0, n_l - 1)
+        ab_cell = np.clip(((lab[..., 1:] - _AB_MIN) // step).astype(np.int64), 0, n_ab - 1)
+        return (l_cell * n_ab + ab_cell[..., 0]) * n_ab + ab_cell[..., 1]
+
+    def _query_lab(self, color):
+        rgb = parse_color(color) if isinstance(color, str) else color
+        return rgb_to_lab(np.asarray(rgb, dtype=np.float64)).astype(np.float32)
+
+    def _candidates(self, lab, radius, palette, min_share):
+        """Rows in the grid cells within `radius` of `lab`, with their distances."""
+        n_l, n_ab = self._shape
+        if radius >= MAX_DELTA_E:
+            rows = np.arange(len(self.lab))
+        else:
+            lo = self._cell_ids(lab - radius, self.step, n_l, n_ab)
+            hi = self._cell_ids(lab + radius, self.step, n_l, n_ab)
+            lo_l, lo_a, lo_b = lo // (n_ab * n_ab), lo // n_ab % n_ab, lo % n_ab
+            hi_l, hi_a, hi_b = hi // (n_ab * n_ab), hi // n_ab % n_ab, hi % n_ab
+            # Along b the cells of one (L, a) pair are contiguous: one slice each
+            la = (np.arange(lo_l, hi_l + 1)[:, None] * n_ab + np.arange(lo_a, hi_a + 1)).ravel() * n_ab
+            starts, ends = self._starts[la + lo_b], self._starts[la + hi_b + 1]
+            lengths = ends - starts
+            rows = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        rows = rows[self.primary[rows] | (self.weight[rows] >= min_share)] if palette else rows[self.primary[rows]]
+        dist = np.sqrt(((self.lab[rows] - lab) ** 2).sum(axis=1))
+        return rows, dist
+
+    def _results(self, rows, dist, limit):
+        order = np.argsort(dist, kind="stable")
+        # First (closest) row of each image
+        _, first = np.unique(self.image[rows[order]], return_index=True)
+        best = order[np.sort(first)][:limit]
+        return [
+            (self.path(int(self.image[r])), tuple(int(c) for c in self.rgb[r]), float(d))
+            for r, d in zip(rows[best], dist[best])
+        ]
@@ -0,0 +1,86 @@
+"""Adaptive worker count driven by live system load."""
+import sys
+import time
+import multiprocessing
+import psutil
+
+CONTROL_INTERVAL = 2.0
+GROW_BELOW_CPU = 75.0
+SHRINK_ABOVE_MEMORY = 85.0
+SHRINK_ABOVE_IOWAIT = 30.0
+# ProcessPoolExecutor refuses more workers than this on Windows
+WINDOWS_MAX_WORKERS = 61
+
+
+def worker_bounds(low_power_mode, min_workers=None, max_workers=None):
+    """(minimum, maximum) worker processes for a run."""
+    cpus = multiprocessing.cpu_count()
+    if max_workers is None:
+        max_workers = 1 if low_power_mode else max(1, cpus - 1)
+    if sys.platform == "win32":
+        max_workers = min(max_workers, WINDOWS_MAX_WORKERS)
+    min_workers = max(1, min(min_workers or 1, max_workers))
+    return min_workers, max(1, max_workers)
+
+
+class WorkerController:
+    """Decides how many workers should be busy, re-evaluated every `interval` seconds.
+
+    The pool is sized for `maximum`; the run only keeps `active` workers'
+    worth of tasks in flight. Growth is fast while the CPUs have headroom,
+    and the count is cut back under memory pressure, heavy I/O wait or as
+    soon as the machine runs on battery.
+    """
+
+    def __init__(self, initial, minimum, maximum, interval=CONTROL_INTERVAL):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.active = max(self.minimum, min(self.maximum, initial))
+        self.peak = self.active
+        self.interval = interval
+        self.last_sample = {}
+        self._next = time.monotonic() + interval
+        # Both report usage since their previous call; the first call is a baseline
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_times_percent(interval=None)
+
+    def sample(self):
+        battery = None
+        try:
+            battery = psutil.sensors_battery()
+        except Exception:
+            pass
+        return {
+            "cpu": psutil.cpu_percent(interval=None),
+            "memory": psutil.virtual_memory().percent,
+            "iowait": getattr(psutil.cpu_times_percent(interval=None), "iowait", 0.0),
+            "on_battery": bool(battery and not battery.power_plugged),
+        }
+
+    def decide(self, sample):
+        """New (active, reason) for a load sample."""
+        active = self.active
+        if sample["on_battery"]:
+            return self.minimum, "on battery"
+        if sample["memory"] >= SHRINK_ABOVE_MEMORY:
+            return max(self.minimum, active // 2), "memory pressure"
+        if sample["iowait"] >= SHRINK_ABOVE_IOWAIT:
+            return max(self.minimum, active - 1), "waiting on disk"
+        if sample["cpu"] < GROW_BELOW_CPU:
+            return min(self.maximum, active + max(1, active // 2)), "CPU headroom"
+        return active, None
+
+    def update(self):
+        """Re-evaluate if the interval has passed; returns a reason when `active` changed."""
+        now = time.monotonic()
+        if now < self._next or self.minimum == self.maximum:
+            return None
+        self._next = now + self.interval
+
+        self.last_sample = self.sample()
+        active, reason = self.decide(self.last_sample)
+        if active == self.active:
+            return None
+        self.active = active
+        self.peak = max(self.peak, active)
+        return reason
@@ -1,49 +1,327 @@
 import numpy as np
 from PIL import Image
-from sklearn.cluster import KMeans
 import colorsys
+import time
+import warnings
+from functools import lru_cache
 
-def dominant_color(path, sample_size=50, n_clusters=3, n_init=1, max_iter=100, s_threshold=0.25, v_threshold=0.25):
-    """Compute dominant color with adjustable accuracy options.
+# Modes Image.reduce can average directly; anything else is converted first
+_REDUCIBLE_MODES = ("RGB", "L")
+# Largest image decoded, after JPEG DCT scaling: about 200 MB of RGB
+DEFAULT_MAX_PIXELS = 64_000_000
 
-    Parameters:
-    - sample_size: int, resize shorter side (square) used for clustering
-    - n_clusters: int, number of KMeans clusters
-    - n_init, max_iter: KMeans settings
-    - s_threshold, v_threshold: thresholds to ignore low-sat/value clusters
+
+class ImageTooLarge(Exception):
+    """The image would decode to more pixels than the budget allows."""
+
+
+class DecodeTimeout(Exception):
+    """Raised into a decode that ran over its time limit (see pipeline._time_limit)."""
+
+
+def load_pixels(path, sample_size=50, timing=None, max_pixels=DEFAULT_MAX_PIXELS):
+    """Decode `path` at reduced resolution and return a (sample_size**2, 3) uint8 array.
+
+    JPEGs are decoded with DCT scaling via `draft()`, other formats are
+    box-reduced right after decoding so only the small image is converted.
+    Returns None if the file cannot be read. Raises ImageTooLarge, before
+    decoding anything, when the (DCT scaled) size read from the header is
+    above `max_pixels`. Seconds spent decoding and resizing are added to the
+    optional `timing` dict.
     """
+    start = time.perf_counter()
     try:
-        img = Image.open(path).convert("RGB")
-    except:
+        with warnings.catch_warnings():
+            # `max_pixels` is checked below, from the header, before decoding
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(path) as img:
+                img.draft("RGB", (sample_size, sample_size))
+                if max_pixels and img.width * img.height > max_pixels:
+                    raise ImageTooLarge(
+                        f"{img.width}x{img.height} is over the {max_pixels / 1e6:.0f} MP pixel budget"
+                    )
+                img.load()
+
+                factor = min(img.width // sample_size, img.height // sample_size)
+                if factor >= 2:
+                    if img.mode not in _REDUCIBLE_MODES:
+                        img = img.convert("RGB")
+                    img = img.reduce(factor)
+
+                img = img.convert("RGB")
+    except (ImageTooLarge, DecodeTimeout):
+        raise
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e)) from None
+    except Exception:
         return None
+    finally:
+        decoded = time.perf_counter()
+        if timing is not None:
+            timing["decode"] += decoded - start
 
     img = img.resize((sample_size, sample_size), Image.Resampling.NEAREST)
-    pixels = np.array(img).reshape(-1, 3)
+    pixels = np.asarray(img).reshape(-1, 3)
+    if timing is not None:
+        timing["resize"] += time.perf_counter() - decoded
+    return pixels
+
+def rgb_to_hsv(rgb):
+    """Vectorized colorsys.rgb_to_hsv for an (..., 3) array of 0-255 values.
+
+    Returns h, s, v arrays in [0, 1].
+    """
+    rgb = np.asarray(rgb, dtype=np.float64) / 255
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+    delta = maxc - minc
+
+    safe_max = np.where(maxc > 0, maxc, 1)
+    safe_delta = np.where(delta > 0, delta, 1)
+    s = np.where(maxc > 0, delta / safe_max, 0.0)
+
+    rc = (maxc - r) / safe_delta
+    gc = (maxc - g) / safe_delta
+    bc = (maxc - b) / safe_delta
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(delta > 0, (h / 6.0) % 1.0, 0.0)
+    return h, s, maxc
+
+def select_center(centers, counts, s_threshold=0.25, v_threshold=0.25):
+    """Pick the most populous center that is saturated and bright enough.
+
+    Works on a single image ((K, 3) centers, (K,) counts) or a batch
+    ((B, K, 3), (B, K)); falls back to the largest cluster when none pass.
+    Empty clusters (k above the number of distinct colors) never pass: their
+    centers are stale.
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    counts = np.asarray(counts)
+    _, s, v = rgb_to_hsv(centers)
+
+    order = np.argsort(counts, axis=-1)[..., ::-1]
+    passes = np.take_along_axis((s > s_threshold) & (v > v_threshold) & (counts > 0), order, axis=-1)
+    first = np.where(passes.any(axis=-1), passes.argmax(axis=-1), 0)
+    best = np.take_along_axis(order, first[..., None], axis=-1)
+    return np.take_along_axis(centers, best[..., None], axis=-2)[..., 0, :]
+
+# --------------------- BATCHED K-MEANS ---------------------
+def _kmeans_plusplus(planes, n_clusters, rng):
+    _, batch, n_pixels = planes.shape
+    rows = np.arange(batch)
+    centers = np.empty((batch, n_clusters, 3))
+    centers[:, 0] = planes[:, rows, rng.integers(n_pixels, size=batch)].T
+    closest = _sq_dist(planes, centers[:, 0])
+
+    for k in range(1, n_clusters):
+        cumulative = np.cumsum(closest, axis=1, dtype=np.float64)
+        target = rng.random(batch) * cumulative[:, -1]
+        idx = np.minimum((cumulative < target[:, None]).sum(axis=1), n_pixels - 1)
+        centers[:, k] = planes[:, rows, idx].T
+        np.minimum(closest, _sq_dist(planes, centers[:, k]), out=closest)
+
+    return centers
+
+def _sq_dist(planes, center):
+    # planes: (3, batch, n_pixels), center: (batch, 3)
+    c = center.astype(planes.dtype)
+    d = (planes[0] - c[:, 0, None]) ** 2
+    d += (planes[1] - c[:, 1, None]) ** 2
+    d += (planes[2] - c[:, 2, None]) ** 2
+    return d
+
+def _assign(planes, centers):
+    # One pass per cluster keeps every operation on contiguous (batch, n_pixels)
+    # arrays, which is much faster than reducing over a tiny trailing k axis.
+    min_dist = _sq_dist(planes, centers[:, 0])
+    labels = np.zeros(min_dist.shape, dtype=np.intp)
+    for k in range(1, centers.shape[1]):
+        dist = _sq_dist(planes, centers[:, k])
+        closer = dist < min_dist
+        np.putmask(labels, closer, k)
+        np.minimum(min_dist, dist, out=min_dist)
+    return labels, min_dist
+
+def _cluster_sums(planes, labels, n_clusters):
+    batch = labels.shape[0]
+    flat = (labels + n_clusters * np.arange(batch)[:, None]).ravel()
+    size = batch * n_clusters
+    counts = np.bincount(flat, minlength=size).reshape(batch, n_clusters)
+    sums = np.stack(
+        [np.bincount(flat, weights=planes[c].ravel(), minlength=size) for c in range(3)],
+        axis=-1,
+    ).reshape(batch, n_clusters, 3)
+    return sums, counts
+
+def _lloyd(planes, centers, max_iter, tol):
+    """Run Lloyd iterations until every image has converged; returns final centers."""
+    # Tolerance is relative to each image's pixel variance, as in scikit-learn
+    tol_abs = planes.var(axis=2, dtype=np.float64).mean(axis=0) * tol
+    active = np.arange(centers.shape[0])
+    centers = centers.copy()
+
+    for _ in range(max_iter):
+        sub = planes[:, active]
+        labels, _ = _assign(sub, centers[active])
+        sums, counts = _cluster_sums(sub, labels, centers.shape[1])
+        old = centers[active]
+        new = np.where(counts[..., None] > 0, sums / np.maximum(counts, 1)[..., None], old)
+        centers[active] = new
+
+        shift = ((new - old) ** 2).sum(axis=(1, 2))
+        active = active[shift > tol_abs[active]]
+        if active.size == 0:
+            break
+
+    return centers
+
+def kmeans_batch(pixels, n_clusters=3, n_init=1, max_iter=100, tol=1e-4, random_state=None):
+    """Lloyd's k-means run on a whole batch of images at once.
+
+    `pixels` is a (batch, n_pixels, 3) array. Returns (centers, counts) with
+    shapes (batch, n_clusters, 3) and (batch, n_clusters), keeping the best of
+    `n_init` k-means++ initialisations per image.
+    """
+    planes = np.ascontiguousarray(np.moveaxis(np.asarray(pixels), -1, 0), dtype=np.float32)
+    rng = np.random.default_rng(random_state)
+
+    best_centers = best_counts = best_inertia = None
+    for _ in range(max(1, n_init)):
+        centers = _lloyd(planes, _kmeans_plusplus(planes, n_clusters, rng), max_iter, tol)
+        labels, min_dist = _assign(planes, centers)
+        _, counts = _cluster_sums(planes, labels, n_clusters)
+        inertia = min_dist.sum(axis=1, dtype=np.float64)
+
+        if best_inertia is None:
+            best_centers, best_counts, best_inertia = centers, counts, inertia
+        else:
+            better = inertia < best_inertia
+            best_centers = np.where(better[:, None, None], centers, best_centers)
+            best_counts = np.where(better[:, None], counts, best_counts)
+            best_inertia = np.minimum(inertia, best_inertia)
+
+    return best_centers, best_counts
+
+# --------------------- HISTOGRAM QUANTIZATION ---------------------
+def histogram_batch(pixels, bins=8):
+    """Quantize each image into a coarse bins**3 RGB histogram in one pass.
+
+    Returns (centers, counts) shaped like kmeans_batch output, where each
+    center is the mean of the pixels falling in that bin (zeros when empty).
+    """
+    px = np.asarray(pixels)
+    batch = px.shape[0]
+    n_bins = bins ** 3
+
+    q = (px.astype(np.intp) * bins) >> 8
+    idx = (q[..., 0] * bins + q[..., 1]) * bins + q[..., 2]
+    flat = (idx + n_bins * np.arange(batch)[:, None]).ravel()
+    size = batch * n_bins
+
+    counts = np.bincount(flat, minlength=size)
+    sums = np.stack(
+        [np.bincount(flat, weights=px[..., c].ravel(), minlength=size) for c in range(3)],
+        axis=-1,
+    )
+    centers = sums / np.maximum(counts, 1)[:, None]
+    return centers.reshape(batch, n_bins, 3), counts.reshape(batch, n_bins)
+
+# --------------------- DOMINANT COLOR ---------------------
+ENGINES = ("sklearn", "batched", "histogram")
+PALETTE_MIN_SHARE = 0.02  # smaller clusters are left out of a palette
+PALETTE_MAX_COLORS = 8
+
+def _sklearn_clusters(pixels, n_clusters, n_init, max_iter):
+    # Imported on first use: scikit-learn dominates start-up time otherwise
+    from sklearn.cluster import KMeans
 
     try:
         kmeans = KMeans(n_clusters=n_clusters, n_init=n_init, max_iter=max_iter)
         kmeans.fit(pixels)
     except Exception:
-        return np.mean(pixels, axis=0)
+        return np.mean(pixels, axis=0)[None], np.array([len(pixels)])
 
-    unique, counts = np.unique(kmeans.labels_, return_counts=True)
-    indices = np.argsort(counts)[::-1]
+    return kmeans.cluster_centers_, np.bincount(kmeans.labels_, minlength=n_clusters)
 
-    best_center = None
+def _cluster_stack(pixels, engine, n_clusters, n_init, max_iter):
+    if engine == "histogram":
+        return histogram_batch(pixels)
+    return kmeans_batch(pixels, n_clusters, n_init, max_iter)
 
-    for i in indices:
-        center = kmeans.cluster_centers_[i]
-        r, g, b = center
-        h, s, v = colorsys.rgb_to_hsv(r/255, g/255, b/255)
+def _palette(centers, counts):
+    """[(rgb, share), ...] of one image's clusters, largest first."""
+    counts = np.asarray(counts, dtype=np.float64)
+    shares = counts / max(counts.sum(), 1.0)
+    order = np.argsort(shares, kind="stable")[::-1][:PALETTE_MAX_COLORS]
+    return [
+        (tuple(float(c) for c in centers[k]), float(shares[k]))
+        for k in order if shares[k] >= PALETTE_MIN_SHARE
+    ]
 
-        if s > s_threshold and v > v_threshold:
-            best_center = center
-            break
+def dominant_color(path, sample_size=50, n_clusters=3, n_init=1, max_iter=100, s_threshold=0.25, v_threshold=0.25, engine="sklearn"):
+    """Compute dominant color with adjustable accuracy options.
+
+    Parameters:
+    - sample_size: int, resize shorter side (square) used for clustering
+    - n_clusters: int, number of KMeans clusters
+    - n_init, max_iter: KMeans settings
+    - s_threshold, v_threshold: thresholds to ignore low-sat/value clusters
+    - engine: "sklearn" (KMeans per image), "batched" (NumPy Lloyd iterations)
+      or "histogram" (most populous RGB bin, no iterative clustering)
+    """
+    pixels = load_pixels(path, sample_size)
+    if pixels is None:
+        return None
+    return colors_from_pixels(pixels[None], None, n_clusters, n_init, max_iter, s_threshold, v_threshold, engine)[0]
+
+def dominant_palette(path, sample_size=50, n_clusters=3, n_init=1, max_iter=100, s_threshold=0.25, v_threshold=0.25, engine="sklearn"):
+    """Dominant color and weighted palette of an image, from one clustering pass.
+
+    Takes the same options as dominant_color. Returns None for unreadable
+    files, else (dominant rgb, [(rgb, share, class name), ...]) with the
+    palette largest cluster first; shares are fractions of the sampled
+    pixels.
+    """
+    pixels = load_pixels(path, sample_size)
+    if pixels is None:
+        return None
+    dominant, palettes = palettes_from_pixels(
+        pixels[None], None, n_clusters, n_init, max_iter, s_threshold, v_threshold, engine
+    )
+    palette = palettes[0]
+    names = classify_colors(np.array([rgb for rgb, _ in palette]).reshape(-1, 3))
+    return dominant[0], [(rgb, share, str(name)) for (rgb, share), name in zip(palette, names)]
+
+def colors_from_pixels(pixels, sample_size=None, n_clusters=3, n_init=1, max_iter=100, s_threshold=0.25, v_threshold=0.25, engine="sklearn"):
+    """Dominant color of every image in an already sampled (batch, n_pixels, 3) stack.
+
+    Accepts the same keyword arguments as dominant_color (sample_size is
+    ignored) and returns a (batch, 3) array.
+    """
+    if engine in ("batched", "histogram"):
+        centers, counts = _cluster_stack(pixels, engine, n_clusters, n_init, max_iter)
+        return select_center(centers, counts, s_threshold, v_threshold)
+
+    return np.array([
+        select_center(centers, counts, s_threshold, v_threshold)
+        for centers, counts in (_sklearn_clusters(px, n_clusters, n_init, max_iter) for px in pixels)
+    ])
 
-    if best_center is None:
-        best_center = kmeans.cluster_centers_[indices[0]]
+def palettes_from_pixels(pixels, sample_size=None, n_clusters=3, n_init=1, max_iter=100, s_threshold=0.25, v_threshold=0.25, engine="sklearn"):
+    """colors_from_pixels plus the palette of every image, from the same clustering.
 
-    return best_center
+    Returns the (batch, 3) dominant colors and one [(rgb, share), ...]
+    list per image, largest cluster first, without clusters under
+    PALETTE_MIN_SHARE of the pixels.
+    """
+    if engine in ("batched", "histogram"):
+        centers, counts = _cluster_stack(pixels, engine, n_clusters, n_init, max_iter)
+        dominant = select_center(centers, counts, s_threshold, v_threshold)
+    else:
+        centers, counts = zip(*[_sklearn_clusters(px, n_clusters, n_init, max_iter) for px in pixels]) or ((), ())
+        dominant = np.array([select_center(c, n, s_threshold, v_threshold) for c, n in zip(centers, counts)])
+    return dominant.reshape(-1, 3), [_palette(c, n) for c, n in zip(centers, counts)]
 
 def classify_color(rgb):
     if rgb is None: return "Unknown"
@@ -65,4 +343,100 @@ def classify_color(rgb):
     if h < 260: return "Blue"
     if h < 300: return "Purple"
     if h < 345: return "Pink"
-    return "Mixed"
\ No newline at end of file
+    return "Mixed"
+
+# --------------------- BATCH CLASSIFICATION ---------------------
+COLOR_CLASSES = ("Red", "Orange", "Yellow", "Green", "Cyan", "Blue", "Purple", "Pink",
+                 "Black", "White", "Gray", "Mixed", "Unknown")
+_CLASS_NAMES = np.array(COLOR_CLASSES, dtype=object)
+_HUE_EDGES = np.array([15, 35, 65, 160, 195, 260, 300, 345])
+_UNKNOWN = COLOR_CLASSES.index("Unknown")
+
+LUT_BITS = 6
+LUT_MIN_ROWS = 65536
+_AMBIGUOUS = 255
+
+def _classify_exact(rgb):
+    """Class indices for an (N, 3) float array, same rules as classify_color."""
+    h, s, v = rgb_to_hsv(rgb)
+    h = h * 360
+
+    # Hue bands: Red wraps around, so bin 8 (>= 345) maps back to Red (0)
+    cls = np.searchsorted(_HUE_EDGES, h, side="right") % 8
+    cls = np.where(np.isnan(h), COLOR_CLASSES.index("Mixed"), cls)
+
+    achromatic = np.where(v < 0.2, COLOR_CLASSES.index("Black"),
+                          np.where(v > 0.90, COLOR_CLASSES.index("White"), COLOR_CLASSES.index("Gray")))
+    return np.where(s < 0.15, achromatic, cls).astype(np.uint8)
+
+@lru_cache(maxsize=None)
+def color_lut():
+    """Quantized RGB -> class index table with (2**LUT_BITS)**3 cells.
+
+    A cell holds its class only if the rules agree on a sub-lattice covering
+    the whole cell including its far faces; cells touching a decision
+    boundary (and their neighbours) are marked ambiguous and resolved with
+    the exact rules by classify_colors.
+    """
+    cells = 1 << LUT_BITS
+    step = 256 // cells
+    # Sample every cell on a lattice of spacing step / 2, shared between neighbours
+    axis = np.minimum(np.arange(0, 256 + 1, step // 2), 255).astype(np.float64)
+    n = axis.size
+
+    lut = np.empty((cells, cells, cells), dtype=np.uint8)
+    for i in range(cells):
+        r = axis[2 * i:2 * i + 3]
+        grid = np.stack(np.meshgrid(r, axis, axis, indexing="ij"), axis=-1).reshape(-1, 3)
+        cls = _classify_exact(grid).reshape(3, n, n)
+
+        # Collapse the 3x3 lattice points of each (g, b) cell
+        lo = cls.min(axis=0)
+        hi = cls.max(axis=0)
+        view_lo = np.lib.stride_tricks.sliding_window_view(lo, (3, 3))[::2, ::2]
+        view_hi = np.lib.stride_tricks.sliding_window_view(hi, (3, 3))[::2, ::2]
+        cell_lo = view_lo.min(axis=(-2, -1))
+        cell_hi = view_hi.max(axis=(-2, -1))
+        lut[i] = np.where(cell_lo == cell_hi, cell_lo, _AMBIGUOUS)
+
+    # Widen the ambiguous band by one cell so thin wedges can't slip through
+    ambiguous = lut == _AMBIGUOUS
+    grown = ambiguous.copy()
+    for axis_ in range(3):
+        for shift in (1, -1):
+            grown |= np.roll(ambiguous, shift, axis=axis_)
+    lut[grown] = _AMBIGUOUS
+    return lut
+
+def classify_color_indices(rgb):
+    """Vectorized classify_color returning indices into COLOR_CLASSES.
+
+    Large inputs go through the precomputed color_lut(); small ones (where
+    building the table would dominate) use the exact rules directly. Rows
+    containing NaN (e.g. unreadable images) map to "Unknown".
+    """
+    rgb = np.asarray(rgb, dtype=np.float64).reshape(-1, 3)
+    if not np.isfinite(rgb).all():
+        finite = np.isfinite(rgb).all(axis=1)
+        out = np.full(len(rgb), _UNKNOWN, dtype=np.uint8)
+        out[finite] = classify_color_indices(rgb[finite])
+        return out
+
+    if len(rgb) < LUT_MIN_ROWS:
+        return _classify_exact(rgb)
+
+    clipped = np.clip(rgb, 0, 255)
+    cells = clipped.astype(np.intp) >> (8 - LUT_BITS)
+    cls = color_lut()[cells[:, 0], cells[:, 1], cells[:, 2]]
+
+    exact = cls == _AMBIGUOUS
+    if rgb.min() < 0 or rgb.max() > 255:
+        exact |= (clipped != rgb).any(axis=1)
+    exact = np.flatnonzero(exact)
+    if exact.size:
+        cls[exact] = _classify_exact(rgb[exact])
+    return cls
+
+def classify_colors(rgb):
+    """Classify an (N, 3) array of RGB values; returns an array of class names."""
+    return _CLASS_NAMES[classify_color_indices(rgb)]
@@ -0,0 +1,102 @@
+"""Exact and near-duplicate detection for input images."""
+import os
+import filecmp
+import hashlib
+import threading
+import numpy as np
+from PIL import Image
+
+DUPLICATE_MODES = ("report", "skip")
+FINGERPRINT_BYTES = 64 * 1024
+NEAR_THRESHOLD = 3  # max differing dHash bits; 4 bands guarantee a shared band up to 3
+# dHash alone matches any two smooth gradients, so the colors have to agree too
+COLOR_TOLERANCE = 8
+_BANDS = 4
+
+
+def fingerprint(path):
+    """Size plus a digest of the first and last 64 KiB, cheap even on slow disks."""
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            digest = hashlib.blake2b(f.read(FINGERPRINT_BYTES), digest_size=16)
+            if size > 2 * FINGERPRINT_BYTES:
+                f.seek(-FINGERPRINT_BYTES, os.SEEK_END)
+            digest.update(f.read(FINGERPRINT_BYTES))
+    except OSError:
+        return None
+    return size, digest.digest()
+
+
+def signature(pixels):
+    """Perceptual signature of a load_pixels() sample: (64-bit dHash, 4x4 color thumbnail)."""
+    side = int(round(np.sqrt(len(pixels))))
+    img = Image.fromarray(np.ascontiguousarray(pixels.reshape(side, side, 3)))
+    small = np.asarray(img.convert("L").resize((9, 8), Image.Resampling.BOX), dtype=np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    h = int(np.packbits(bits).view(">u8")[0])
+    return h, np.asarray(img.resize((4, 4), Image.Resampling.BOX), dtype=np.int16)
+
+
+class DuplicateIndex:
+    """Groups inputs with identical content or a near-identical dHash.
+
+    The first file of a group is its representative; only that one gets
+    analysed. Lookups register unseen files as new representatives, and
+    are safe to call from the I/O threads of the staged pipeline.
+    """
+
+    def __init__(self, input_dir, threshold=NEAR_THRESHOLD):
+        self.input_dir = input_dir
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._near = {}
+        self._bands = [{} for _ in range(_BANDS)]
+
+    def exact(self, filename, key):
+        """Representative with the same fingerprint `key`, or None; see confirm()."""
+        if key is None:
+            return None
+        with self._lock:
+            rep = self._exact.setdefault(key, filename)
+        return None if rep == filename else rep
+
+    def confirm(self, filename, rep):
+        """Whether `filename` has the same bytes as its exact() representative `rep`.
+
+        Reads both files, so it belongs on an I/O thread. The representative
+        may already have been moved away; the fingerprint is trusted then. A
+        comparison that fails midway (e.g. the file is moved meanwhile)
+        counts as different.
+        """
+        if rep is None:
+            return False
+        rep_path = os.path.join(self.input_dir, rep)
+        try:
+            return not os.path.exists(rep_path) or filecmp.cmp(
+                rep_path, os.path.join(self.input_dir, filename), shallow=False
+            )
+        except OSError:
+            return False
+
+    def similar(self, filename, sig):
+        """Representative with a signature close to `sig`, or None.
+
+        A file looked up again (its read was retried) is not its own duplicate.
+        """
+        h, thumb = sig
+        bands = [(h >> (16 * i)) & 0xFFFF for i in range(_BANDS)]
+        with self._lock:
+            if filename in self._near:
+                return None
+            for i, band in enumerate(bands):
+                for rep in self._bands[i].get(band, ()):
+                    rep_h, rep_thumb = self._near[rep]
+                    if (bin(rep_h ^ h).count("1") <= self.threshold
+                            and np.abs(rep_thumb - thumb).mean() <= COLOR_TOLERANCE):
+                        return rep
+            self._near[filename] = sig
+            for i, band in enumerate(bands):
+                self._bands[i].setdefault(band, []).append(filename)
+        return None
@@ -0,0 +1,111 @@
+"""Append-only progress journal that lets an interrupted run resume."""
+import os
+import json
+import time
+import hashlib
+
+from cache import default_cache_path
+
+FLUSH_EVERY = 256
+FLUSH_SECONDS = 2.0
+
+
+def default_journal_dir():
+    return os.path.join(os.path.dirname(default_cache_path()), "journals")
+
+
+def job_key(input_dir, output_dir, settings):
+    """Digest identifying a job: same folders and settings resume the same journal."""
+    blob = json.dumps(
+        [os.path.abspath(input_dir), os.path.abspath(output_dir), settings],
+        sort_keys=True, separators=(",", ":"),
+    )
+    return hashlib.blake2b(blob.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def file_signature(path):
+    """(size, mtime_ns) of `path`, or None when it is gone (e.g. moved to the output)."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class Journal:
+    """One JSON line per finished file: [filename, "placed" | "skipped", class,
+    signature], plus a list of secondary classes for files that have them.
+
+    The signature is the file_signature() of the input when it was recorded,
+    so a resumed run can tell files that were edited in the meantime.
+
+    Lines are buffered and written with an fsync every FLUSH_EVERY entries
+    or FLUSH_SECONDS, so a crash loses at most a few seconds of work. A torn
+    last line is cut off when the journal is opened again.
+    """
+
+    def __init__(self, path, header=None):
+        self.path = path
+        self.header = header or {}
+        self._file = None
+        self._buffer = []
+        self._flushed = time.monotonic()
+
+    def load(self):
+        """Entries of an earlier, unfinished run as {filename: (status, class, secondary classes, signature)}."""
+        done = {}
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return done
+
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, list) and len(entry) in (4, 5):
+                signature = tuple(entry[3]) if isinstance(entry[3], list) else None
+                done[entry[0]] = (entry[1], entry[2], entry[4] if len(entry) == 5 else [], signature)
+
+        if end < len(data):
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+        return done
+
+    def open(self, fresh=False):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if fresh or not os.path.exists(self.path):
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(dict(self.header, created=time.time())) + "\n")
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def record(self, filename, status, class_name, secondary=None, signature=None):
+        entry = [filename, status, class_name, signature] + ([list(secondary)] if secondary else [])
+        self._buffer.append(json.dumps(entry) + "\n")
+        if len(self._buffer) >= FLUSH_EVERY or time.monotonic() - self._flushed >= FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self):
+        self._flushed = time.monotonic()
+        if not self._buffer or self._file is None:
+            return
+        self._file.write("".join(self._buffer))
+        self._buffer = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self, complete=False):
+        """Flush and close; a completed job has nothing to resume, so its journal goes away."""
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+        if complete:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
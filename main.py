@@ -5,13 +5,11 @@ import multiprocessing
 os.environ["OMP_NUM_THREADS"] = "1"
 os.environ["MKL_NUM_THREADS"] = "1"
 
-from PyQt6.QtWidgets import QApplication
-from ui.splash import ModernSplashScreen
-from ui.app_gui import PrismPaperGUI
-from ui.window import ModernWindow
 
-if __name__ == "__main__":
-    multiprocessing.freeze_support()  # <-- Fix for Windows frozen apps
+def run_gui():
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QTimer
+    from ui.splash import ModernSplashScreen
 
     if sys.platform == 'win32':
         import ctypes
@@ -26,13 +24,37 @@ if __name__ == "__main__":
     splash = ModernSplashScreen()
     splash.show()
 
-    splash.smooth_progress(30, duration=0.3)
-    splash.smooth_progress(70, duration=0.5)
-    splash.smooth_progress(100, duration=0.3)
+    # The splash follows the real startup work
+    splash.progress_update(10, "Loading interface...")
+    from ui.app_gui import PrismPaperGUI
+    from ui.window import ModernWindow
+
+    splash.progress_update(40, "Loading color engine...")
+    import pipeline  # noqa: F401  NumPy, Pillow and the engine, so the first sort starts right away
+    from pool import WarmPool
 
-    logic_widget = PrismPaperGUI()
+    splash.progress_update(75, "Building window...")
+    pool = WarmPool()
+    logic_widget = PrismPaperGUI(pool)
     window = ModernWindow(logic_widget)
+
+    splash.progress_update(100, "Ready")
     window.show()
     splash.finish(window)
 
-    sys.exit(app.exec())
+    # Worker processes start once the window is up and are reused by every run
+    QTimer.singleShot(0, pool.start)
+    app.aboutToQuit.connect(pool.shutdown)
+
+    return app.exec()
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # <-- Fix for Windows frozen apps
+
+    # Sub-commands run headless and never import PyQt
+    if len(sys.argv) > 1 and sys.argv[1] in ("sort", "watch", "cache", "index", "query", "-h", "--help"):
+        from cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    sys.exit(run_gui())
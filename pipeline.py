@@ -0,0 +1,1325 @@
+"""Qt-free sorting pipeline shared by the GUI worker thread and the CLI."""
+import os
+import time
+import signal
+import cProfile
+import threading
+import contextlib
+import collections
+import concurrent.futures
+import multiprocessing
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory, util
+import numpy as np
+import psutil
+from core import (
+    DEFAULT_MAX_PIXELS, DecodeTimeout, ImageTooLarge, load_pixels, classify_colors, palettes_from_pixels,
+)
+from cache import ColorCache, settings_key
+from scanner import ListSource
+from placement import ensure_dir, forget_dirs, place, prepare_output
+from dedup import DuplicateIndex, fingerprint, signature
+from prefilter import plausible
+from controller import WorkerController, worker_bounds
+from journal import Journal, file_signature, job_key
+from stats import DEFAULT_SLOWEST, RunStats, new_timing, write_report
+from pool import BOARD_SLOTS, WarmPool
+
+
+# --------------------- ACCURACY PRESETS ---------------------
+ACCURACY_PRESETS = {
+    "Normal": {'sample_size': 50, 'n_clusters': 3, 'n_init': 1, 'max_iter': 100, 's_threshold': 0.25, 'v_threshold': 0.25},
+    "High": {'sample_size': 100, 'n_clusters': 5, 'n_init': 3, 'max_iter': 200, 's_threshold': 0.20, 'v_threshold': 0.20},
+    "Low": {'sample_size': 30, 'n_clusters': 2, 'n_init': 1, 'max_iter': 50, 's_threshold': 0.15, 'v_threshold': 0.15, 'engine': 'histogram'},
+}
+
+
+def accuracy_settings_for(preset="Normal", engine=None):
+    """Copy of a preset, optionally overriding its clustering engine."""
+    settings = dict(ACCURACY_PRESETS[preset])
+    if engine:
+        settings['engine'] = engine
+    return settings
+
+
+# --------------------- COLOR CACHE ---------------------
+_local = threading.local()
+
+
+def _get_cache(cache_path):
+    """One cache connection per worker process or I/O thread."""
+    cache = getattr(_local, "color_cache", None)
+    if cache is None or cache.path != cache_path:
+        cache = _local.color_cache = ColorCache(cache_path)
+    return cache
+
+
+# --------------------- PROCESS WORKER ---------------------
+_worker_context = None
+_worker_run = None
+
+
+def init_worker(context, profile_claim=None):
+    """Pool initializer: receives the {"controls", "profile"} shared by every run.
+
+    The settings of each run arrive with its tasks (see _task_context).
+    With context["profile"] set, the first worker to start runs under
+    cProfile and writes its stats there when the pool shuts down.
+    """
+    global _worker_context
+    _worker_context = context
+    # Ctrl+C is handled by the parent, which winds the pool down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    if context.get("profile") and profile_claim is not None:
+        with profile_claim.get_lock():
+            claimed, profile_claim.value = profile_claim.value, 1
+        if not claimed:
+            profiler = cProfile.Profile()
+            util.Finalize(None, _dump_profile, args=(profiler, context["profile"]), exitpriority=10)
+            profiler.enable()
+
+
+def _dump_profile(profiler, path):
+    profiler.disable()
+    try:
+        profiler.dump_stats(path)
+    except OSError:
+        pass
+
+
+def _task_context(context):
+    """Settings sent with a task, joined with the controls given to init_worker."""
+    global _worker_run
+    if context["run"] != _worker_run:
+        # A new run on a long-lived process; its output may have been emptied meanwhile
+        _worker_run = context["run"]
+        forget_dirs()
+    return dict(context, controls=_worker_context["controls"])
+
+
+def _board_tracker(slot):
+    """Per-file callback for a task given `slot` on the pool's board (see pool.WarmPool).
+
+    Records this process and, while a file is decoded, its position in the
+    batch; -1 while the task does anything else.
+    """
+    board = (_worker_context or {}).get("board")
+    if board is None or slot is None:
+        return None
+    board[2 * slot], board[2 * slot + 1] = os.getpid(), -1
+
+    def track(i):
+        board[2 * slot + 1] = -1 if i is None else i + 1
+
+    return track
+
+
+def warm_worker():
+    """Warm-up task: import the default clustering engine before the first batch."""
+    try:
+        import sklearn.cluster  # noqa: F401  the bulk of a cold worker's first task
+    except ImportError:
+        pass
+    return os.getpid()
+
+
+# --------------------- SECONDARY COLORS ---------------------
+SECONDARY_MODES = ("place", "manifest")
+SECONDARY_SHARE = 0.25  # share of the image a second color class needs
+MANIFEST_NAME = "prismpaper-secondary.json"
+
+
+def _secondary_classes(ctx, palette, primary):
+    """Classes other than `primary` covering SECONDARY_SHARE of the image, largest first."""
+    if not ctx["secondary"] or not palette:
+        return []
+    names = classify_colors(np.array([rgb for rgb, _ in palette], dtype=np.float64))
+    shares = {}
+    for name, (_, share) in zip(names, palette):
+        shares[str(name)] = shares.get(str(name), 0.0) + share
+    return [
+        name for name, share in sorted(shares.items(), key=lambda item: -item[1])
+        if share >= ctx["secondary_share"] and name not in (primary, "Unknown")
+    ]
+
+
+def make_context(
+    input_dir, output_dir, copy_mode, target_colors, accuracy_settings=None, cache_path=None, mirror=True,
+    placement=None, profile=None, controls=None, run=None, prefilter=None, max_pixels=DEFAULT_MAX_PIXELS,
+    file_timeout=None, secondary=None, secondary_share=SECONDARY_SHARE,
+):
+    return {
+        "input_dir": input_dir,
+        "output_dir": output_dir,
+        "copy_mode": copy_mode,
+        # How files land in the output; see placement.STRATEGIES
+        "placement": "move" if not copy_mode else (placement or "copy"),
+        "target_colors": target_colors,
+        "accuracy_settings": accuracy_settings or {},
+        "cache_path": cache_path,
+        "mirror": mirror,
+        # Target-color check before clustering; see prefilter.PREFILTER_MODES
+        "prefilter": None if "All Colors" in target_colors else prefilter,
+        # Limits for hostile files; see core.load_pixels and _time_limit
+        "max_pixels": max_pixels,
+        "file_timeout": file_timeout,
+        # Second color classes of an image: also placed, or only listed; see SECONDARY_MODES
+        "secondary": secondary,
+        "secondary_share": secondary_share,
+        "profile": profile,
+        # (resume event, run counter) shared with the workers; see _checkpoint
+        "controls": controls,
+        "run": run,
+    }
+
+
+def _checkpoint(ctx):
+    """Called between files: blocks while the run is paused, False once it is cancelled.
+
+    A run is cancelled once the shared counter has moved past its number,
+    by stop() or by a later run on the same pool.
+    """
+    controls = ctx.get("controls")
+    if controls is None:
+        return True
+    resume, runs = controls
+    while not resume.wait(PAUSE_POLL_SECONDS):
+        if runs.value != ctx["run"]:
+            return False
+    return runs.value == ctx["run"]
+
+
+@contextlib.contextmanager
+def _time_limit(seconds):
+    """Raise DecodeTimeout in the block after `seconds`.
+
+    Uses SIGALRM, so it only applies in the main thread of a POSIX process
+    (the worker processes); elsewhere the block runs unbounded and the
+    parent's watchdog has to step in.
+    """
+    if not seconds or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def expired(signum, frame):
+        raise DecodeTimeout(f"decoding took longer than {seconds:g} s")
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _count_read(batch, i):
+    """Decoding reads the whole file; account for it in the file's timing."""
+    st = batch["stats"][i]
+    try:
+        batch["timings"][i]["bytes_read"] = st.st_size if st is not None else os.path.getsize(batch["sources"][i])
+    except OSError:
+        pass
+
+
+def _open_cache(ctx):
+    if not ctx["cache_path"]:
+        return None, None
+    try:
+        return _get_cache(ctx["cache_path"]), settings_key(ctx["accuracy_settings"])
+    except Exception:
+        return None, None
+
+
+def _lookup(ctx, filenames):
+    """Resolve cache hits for a batch; the rest is listed in batch["missing"]."""
+    cache, key = _open_cache(ctx)
+    sources = [os.path.join(ctx["input_dir"], f) for f in filenames]
+    batch = {
+        "filenames": filenames,
+        "sources": sources,
+        "colors": [None] * len(sources),
+        "classes": [None] * len(sources),
+        "palettes": [None] * len(sources),
+        "stats": [None] * len(sources),
+        "timings": [new_timing(f) for f in filenames],
+        "missing": [],
+    }
+
+    for i, src in enumerate(sources):
+        if cache is not None:
+            start = time.perf_counter()
+            try:
+                batch["stats"][i] = os.stat(src)
+                cached = cache.get(src, batch["stats"][i], key)
+            except Exception:
+                cached = None
+            batch["timings"][i]["lookup"] = time.perf_counter() - start
+            # Entries from before palettes were cached are analysed again when they are needed
+            if cached is not None and not (ctx["secondary"] and cached[0] is not None and cached[2] is None):
+                batch["colors"][i], batch["classes"][i], batch["palettes"][i] = cached
+                continue
+        batch["missing"].append(i)
+
+    return batch
+
+
+def _store_colors(ctx, batch, indices, computed, palettes):
+    """Classify freshly computed colors and remember them, with their palettes, in the cache."""
+    cache, key = _open_cache(ctx)
+    start = time.perf_counter()
+    rgb = np.array([np.full(3, np.nan) if c is None else c for c in computed], dtype=np.float64)
+    names = classify_colors(rgb.reshape(-1, 3))
+    share = (time.perf_counter() - start) / max(1, len(indices))
+
+    for i, color, name, palette in zip(indices, computed, names, palettes):
+        batch["colors"][i], batch["classes"][i], batch["palettes"][i] = color, str(name), palette
+        batch["timings"][i]["classify"] += share
+        if cache is not None and batch["stats"][i] is not None:
+            try:
+                cache.put(batch["sources"][i], batch["stats"][i], key, color, batch["classes"][i], palette)
+            except Exception:
+                pass
+
+
+def _place_batch(ctx, batch):
+    """Place every classified file of a batch; stops early when the run is cancelled.
+
+    Files without a class are left out: near-duplicates, which the parent
+    places once their representative is done, and files a cancelled
+    worker never got to. Files the prefilter ruled out are skipped, those
+    over the pixel budget or time limit fail.
+    """
+    cache, key = _open_cache(ctx)
+    results = [(batch["filenames"][i], False, None) for i in batch["filtered"]]
+    results.extend((batch["filenames"][i], False, error) for i, error in batch["errors"].items())
+    for filename, src, color, folder_name, palette, timing in zip(
+        batch["filenames"], batch["sources"], batch["colors"], batch["classes"], batch["palettes"], batch["timings"]
+    ):
+        if folder_name is None:
+            continue
+        if not _checkpoint(ctx):
+            break
+        results.append(_place_file(ctx, filename, src, color, folder_name, cache, key, timing, palette))
+    return results
+
+
+def _sort_files(ctx, filenames, track=None):
+    """Analyse and place a batch of files; returns (one result tuple per file, timings)."""
+    batch = _prefetch(ctx, filenames, track=track)
+    if batch["pixels"] is not None and _checkpoint(ctx):
+        _cluster_batch(ctx, batch)
+    return _place_batch(ctx, batch), batch["timings"]
+
+
+def _cluster_batch(ctx, batch):
+    start = time.perf_counter()
+    colors, palettes = palettes_from_pixels(batch["pixels"], **ctx["accuracy_settings"])
+    share = (time.perf_counter() - start) / len(batch["decoded"])
+    for i in batch["decoded"]:
+        batch["timings"][i]["cluster"] = share
+    _store_colors(ctx, batch, batch["decoded"], list(colors), palettes)
+    batch["pixels"] = None
+
+
+def _flat_destination(dst_dir, src, name, copy_mode):
+    """Destination for a flattened file, numbered if another file owns the name."""
+    dst_file = os.path.join(dst_dir, name)
+    stem, ext = os.path.splitext(name)
+    n = 1
+    while os.path.exists(dst_file):
+        # A copy with identical size and mtime was placed by an earlier run
+        if copy_mode:
+            a, b = os.stat(src), os.stat(dst_file)
+            if a.st_size == b.st_size and a.st_mtime_ns == b.st_mtime_ns:
+                break
+        dst_file = os.path.join(dst_dir, f"{stem} ({n}){ext}")
+        n += 1
+    return dst_file
+
+
+def _destination(ctx, folder_name, filename, src, copy_mode):
+    dst_dir = os.path.join(ctx["output_dir"], folder_name)
+    ensure_dir(dst_dir)
+    # filename may be a relative path from a recursive scan
+    if ctx.get("mirror", True):
+        dst_file = os.path.join(dst_dir, filename)
+        ensure_dir(os.path.dirname(dst_file))
+        return dst_file
+    return _flat_destination(dst_dir, src, os.path.basename(filename), copy_mode)
+
+
+def _place_file(ctx, filename, src, color, folder_name, cache, key, timing=None, palette=None, secondary=None):
+    """Place one classified file; returns its result tuple.
+
+    With secondary colors on, `secondary` (worked out from `palette` unless
+    given, e.g. for a duplicate) lists the image's second classes and ends
+    up as a fourth item of the result: in "place" mode the extra folders
+    the file was also placed in, in "manifest" mode all of them.
+    """
+    if secondary is None:
+        secondary = _secondary_classes(ctx, palette, folder_name)
+    target_colors = ctx["target_colors"]
+    folders = [folder_name] + (secondary if ctx["secondary"] == "place" else [])
+    if "All Colors" not in target_colors:
+        folders = [name for name in folders if name in target_colors]
+    if not folders:
+        return (filename, False, None)
+    start = time.perf_counter()
+
+    try:
+        dst_file = _destination(ctx, folders[0], filename, src, ctx["copy_mode"])
+        method = place(src, dst_file, ctx["placement"])
+        if timing is not None and method == "copy":
+            timing["bytes_written"] = os.path.getsize(dst_file)
+        if not ctx["copy_mode"]:
+            # The source path is gone now, keep the entry reachable from the new location
+            if cache is not None:
+                try:
+                    cache.put(dst_file, os.stat(dst_file), key, color, folder_name, palette)
+                except Exception:
+                    pass
+
+        # Further folders get copies too; after a move, clones of the moved file where possible
+        origin = src if ctx["copy_mode"] else dst_file
+        for name in folders[1:]:
+            extra = _destination(ctx, name, filename, origin, True)
+            if place(origin, extra, ctx["placement"] if ctx["copy_mode"] else "auto") == "copy" and timing is not None:
+                timing["bytes_written"] = timing.get("bytes_written", 0) + os.path.getsize(extra)
+
+        if ctx["secondary"] == "place" and len(folders) > 1:
+            return (filename, True, folders[0], folders[1:])
+        if ctx["secondary"] == "manifest" and secondary:
+            return (filename, True, folders[0], secondary)
+        return (filename, True, folders[0])
+    except Exception as e:
+        return (filename, False, str(e))
+    finally:
+        if timing is not None:
+            timing["place"] = time.perf_counter() - start
+
+
+def process_file_worker(args):
+    """Runs in a separate process"""
+    input_dir, output_dir, copy_mode, target_colors, filename, accuracy_settings, cache_path = args
+    ctx = make_context(input_dir, output_dir, copy_mode, target_colors, accuracy_settings, cache_path)
+    return _sort_files(ctx, [filename])[0][0]
+
+
+def process_batch_worker(filenames, context, slot=None):
+    """Runs in a pool started with init_worker; returns (results, seconds, timings)."""
+    start = time.perf_counter()
+    results, timings = _sort_files(_task_context(context), filenames, _board_tracker(slot))
+    return results, time.perf_counter() - start, timings
+
+
+# --------------------- STAGED PIPELINE ---------------------
+def _prefetch(ctx, filenames, index=None, track=None):
+    """Cache lookups plus reduced decodes of the misses.
+
+    The I/O stage of the staged pipeline, run on a thread, and the first
+    half of a worker batch. Decoded images that cannot match any target
+    color (see prefilter.plausible) are listed in batch["filtered"], files
+    over the pixel budget or time limit in batch["errors"]. With a
+    DuplicateIndex, decoded images that look like one already seen are
+    listed in batch["near"] instead of being clustered again. `track(i)` is
+    called before the file at position i is decoded, track(None) once it is.
+    """
+    batch = _lookup(ctx, filenames)
+    sample_size = ctx["accuracy_settings"].get("sample_size", 50)
+
+    decoded, unreadable = [], []
+    batch["near"], batch["filtered"], batch["errors"] = {}, [], {}
+    for i in batch["missing"]:
+        if not _checkpoint(ctx):
+            break
+        if track is not None:
+            track(i)
+        try:
+            with _time_limit(ctx["file_timeout"]):
+                pixels = load_pixels(batch["sources"][i], sample_size, batch["timings"][i], ctx["max_pixels"])
+        except (ImageTooLarge, DecodeTimeout) as e:
+            batch["errors"][i] = str(e)
+            continue
+        finally:
+            # Not decoding any more, e.g. while _checkpoint waits out a pause
+            if track is not None:
+                track(None)
+        _count_read(batch, i)
+        if pixels is None:
+            unreadable.append(i)
+            continue
+        if ctx.get("prefilter"):
+            start = time.perf_counter()
+            keep = plausible(pixels, ctx["target_colors"], ctx["prefilter"])
+            batch["timings"][i]["prefilter"] = time.perf_counter() - start
+            if not keep:
+                batch["timings"][i]["filtered"] = True
+                batch["filtered"].append(i)
+                continue
+        if index is not None:
+            rep = index.similar(filenames[i], signature(pixels))
+            if rep is not None:
+                batch["near"][i] = rep
+                continue
+        decoded.append((i, pixels))
+
+    if unreadable:
+        _store_colors(ctx, batch, unreadable, [None] * len(unreadable), [None] * len(unreadable))
+    batch["decoded"] = [i for i, _ in decoded]
+    batch["pixels"] = np.stack([px for _, px in decoded]) if decoded else None
+    return batch
+
+
+def _share_pixels(pixels):
+    shm = shared_memory.SharedMemory(create=True, size=max(1, pixels.nbytes))
+    np.ndarray(pixels.shape, dtype=pixels.dtype, buffer=shm.buf)[:] = pixels
+    return shm
+
+
+CLUSTER_CHUNK = 16
+
+
+def cluster_shared_worker(name, shape, context):
+    """CPU stage: cluster a pixel stack handed over through shared memory."""
+    ctx = _task_context(context)
+    start = time.perf_counter()
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        pixels = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+    # Chunked so a pause or stop takes effect without finishing the whole stack
+    colors, palettes = [], []
+    for offset in range(0, len(pixels), CLUSTER_CHUNK):
+        if not _checkpoint(ctx):
+            raise RuntimeError("cancelled")
+        chunk_colors, chunk_palettes = palettes_from_pixels(
+            pixels[offset:offset + CLUSTER_CHUNK], **ctx["accuracy_settings"]
+        )
+        colors.extend(chunk_colors)
+        palettes.extend(chunk_palettes)
+    return colors, palettes, time.perf_counter() - start
+
+
+# --------------------- LOW POWER AUTO-DETECT ---------------------
+def auto_low_power_mode():
+    cpu_count = multiprocessing.cpu_count()
+    ram_gb = psutil.virtual_memory().total / (1024**3)
+
+    if cpu_count <= 2:
+        return True
+    if ram_gb <= 4:
+        return True
+    battery = psutil.sensors_battery()
+    if battery and not battery.power_plugged:
+        return True
+
+    return False
+
+
+# --------------------- SORT JOB ---------------------
+INITIAL_BATCH_SIZE = 4
+MAX_BATCH_SIZE = 64
+TARGET_TASK_SECONDS = 0.5
+TASKS_PER_WORKER = 2
+SCAN_POLL_SECONDS = 0.1
+IO_THREADS = 4
+STATS_INTERVAL = 1.0
+PAUSE_POLL_SECONDS = 0.2
+STOP_GRACE_SECONDS = 2.0
+FILE_TIMEOUT = 30.0  # seconds to decode one file
+WORKER_MEMORY_LIMIT = 2 * 1024**3  # resident bytes of one worker before the pool is recycled
+MEMORY_CHECK_SECONDS = 2.0
+MAX_CRASHES = 2  # a file that took down its worker this often fails
+MAX_CAUGHT = 5  # breakdowns a file may be caught up in before it is suspected itself
+WATCHDOG_POLL_SECONDS = 1.0
+
+
+def default_worker_count(low_power_mode):
+    """Workers busy at the start of a run; the controller adjusts from there."""
+    if low_power_mode:
+        return 1
+    return max(1, min(multiprocessing.cpu_count() - 1, 4))
+
+
+class SortJob:
+    """Drives one sorting run over a process pool.
+
+    `files` is a list of paths relative to `input_dir` or a scanner source
+    (see scanner.ScanSource) that keeps discovering files while the run is
+    already processing them; with a watcher.WatchSource the run goes on,
+    sorting files as they arrive, until stop(). With `staged` the run is split into an I/O
+    thread pool that prefetches and decodes, the process pool that only
+    clusters pixel stacks, and a second I/O pool that places files, so slow
+    disks and the CPUs are kept busy at the same time.
+
+    Callbacks are optional: on_progress(processed,
+    total), on_status(message) and checkpoint(), which is called before each
+    result is consumed and may block (the GUI uses it to pause). run()
+    returns a summary dict.
+
+    Per-file stage timings are aggregated into summary["stats"] and passed
+    to on_stats(snapshot) about once per STATS_INTERVAL; `report_path`
+    receives the whole summary, including the `slowest` files, as JSON.
+    `profile_path` runs one worker process under cProfile.
+
+    With a `journal_dir`, every finished file is appended to a per-job
+    journal (see journal.Journal); a later run of the same job with
+    `resume` skips what the journal lists, and a run that completes
+    deletes it. Runs over a source that never completes (a watch) keep no
+    journal.
+
+    The pool holds up to `max_workers` processes (default: all cores but
+    one); a WorkerController keeps between `min_workers` and that many busy
+    depending on CPU, memory, I/O wait and battery state. Equal bounds fix
+    the worker count. With specific target colors, `prefilter` ("strict" or
+    "fast", see prefilter.py) skips clustering images that cannot match
+    them. A `pool` (see pool.WarmPool) runs the job on
+    processes that are already up instead of a pool of its own, and is
+    left running afterwards.
+
+    With `secondary`, the palette of each image is checked for other color
+    classes covering `secondary_share` of it: "place" also puts the file in
+    those folders, "manifest" lists them in MANIFEST_NAME in the output.
+    summary["secondary"] counts them per class.
+
+    Hostile files cost a failed file, not the run: images above
+    `max_pixels` (read from the header) are not decoded, a decode running
+    over `file_timeout` seconds is interrupted, workers above
+    `worker_memory` resident bytes are recycled, and when a worker dies its
+    unfinished files are retried one at a time on fresh processes; a file
+    that kills a worker MAX_CRASHES times fails.
+    """
+
+    def __init__(
+        self,
+        input_dir,
+        output_dir,
+        copy_mode,
+        files,
+        target_colors,
+        low_power_mode=None,
+        accuracy_settings=None,
+        cache_path=None,
+        max_workers=None,
+        min_workers=None,
+        mirror=True,
+        staged=False,
+        placement=None,
+        duplicates=None,
+        prefilter=None,
+        secondary=None,
+        secondary_share=SECONDARY_SHARE,
+        report_path=None,
+        slowest=DEFAULT_SLOWEST,
+        profile_path=None,
+        journal_dir=None,
+        resume=True,
+        pool=None,
+        max_pixels=DEFAULT_MAX_PIXELS,
+        file_timeout=FILE_TIMEOUT,
+        worker_memory=WORKER_MEMORY_LIMIT,
+        on_progress=None,
+        on_status=None,
+        on_stats=None,
+        checkpoint=None,
+    ):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.copy_mode = copy_mode
+        self.source = ListSource(files) if isinstance(files, (list, tuple)) else files
+        self.target_colors = target_colors
+        self.mirror = mirror
+        self.staged = staged
+        self.placement = placement
+        self.duplicates = duplicates
+        self.prefilter = None if "All Colors" in target_colors else prefilter
+        self.secondary = secondary
+        self.secondary_share = secondary_share
+
+        # Auto-detect low-power if not explicitly set
+        self.low_power_mode = (
+            auto_low_power_mode() if low_power_mode is None else low_power_mode
+        )
+        # An auto-detected low-power start may still grow once the controller sees headroom
+        self.min_workers, self.max_workers = worker_bounds(low_power_mode is True, min_workers, max_workers)
+
+        self.accuracy_settings = accuracy_settings or {}
+        self.cache_path = cache_path
+        self.report_path = report_path
+        self.stats = RunStats(slowest)
+        self.profile_path = profile_path
+        self.journal_dir = journal_dir
+        self.resume_journal = resume
+        self.pool = pool
+        self.max_pixels = max_pixels
+        self.file_timeout = file_timeout
+        self.worker_memory = worker_memory
+
+        self.on_progress = on_progress
+        self.on_status = on_status
+        self.on_stats = on_stats
+        self.checkpoint = checkpoint
+
+        # Shared with the worker processes: cleared `_resume` pauses them
+        # between files, bumping `_runs` makes them drop the rest of their batch
+        if pool is not None:
+            self._resume, self._runs = pool.controls
+        else:
+            self._resume = multiprocessing.Event()
+            self._resume.set()
+            self._runs = multiprocessing.Value("i", 0)
+        # The watchdog's clock restarts here: paused workers are not hung
+        self._resumed = 0.0
+
+        self.running = True
+        self.summary = {
+            "total": 0,
+            "processed": 0,
+            "placed": 0,
+            "skipped": 0,
+            "failed": 0,
+            "classes": {},
+            "errors": [],
+            "workers": self.min_workers,
+            "max_workers": self.max_workers,
+            "mode": "low-power" if self.low_power_mode else "performance",
+            "staged": staged,
+            "placement": "move" if not copy_mode else (placement or "copy"),
+            "duplicates": [],
+            "prefilter": self.prefilter,
+            "secondary": {},
+            "resumed": 0,
+            "retried": 0,
+            "elapsed": 0.0,
+        }
+
+    def pause(self):
+        self._resume.clear()
+
+    def resume(self):
+        self._resumed = time.monotonic()
+        self._resume.set()
+
+    def stop(self):
+        self.running = False
+        self.source.stop()
+        with self._runs.get_lock():
+            self._runs.value += 1
+        self._resume.set()
+
+    def _status(self, message):
+        if self.on_status:
+            self.on_status(message)
+
+    # ---------- RUN ----------
+    def run(self):
+        start = time.perf_counter()
+        source = self.source
+        self._processed = 0
+        self._stats_sent = start
+        self.controller = WorkerController(
+            default_worker_count(self.low_power_mode), self.min_workers, self.max_workers
+        )
+        self.summary["workers"] = self.controller.active
+
+        self._status(
+            f"Mode: {'Low Power' if self.low_power_mode else 'Performance'}"
+            f" | Workers: {self.controller.active}/{self.max_workers}"
+            + (" | Staged I/O" if self.staged else "")
+            + (f" | Duplicates: {self.duplicates}" if self.duplicates else "")
+            + (f" | Prefilter: {self.prefilter}" if self.prefilter else "")
+            + (f" | Secondary colors: {self.secondary}" if self.secondary else "")
+        )
+
+        with self._runs.get_lock():
+            self._runs.value += 1
+            run = self._runs.value
+        context = self._context = make_context(
+            self.input_dir, self.output_dir, self.copy_mode, self.target_colors,
+            self.accuracy_settings, self.cache_path, self.mirror, self.placement, self.profile_path,
+            (self._resume, self._runs), run, self.prefilter, self.max_pixels, self.file_timeout,
+            self.secondary, self.secondary_share,
+        )
+        # Events cannot travel with a task; the workers got them when they started
+        self._task_context = {k: v for k, v in context.items() if k != "controls"}
+        # After a worker died: files that took it down, and the others caught up in it
+        self._retry = collections.deque()
+        self._requeue = collections.deque()
+        self._crashes = {}
+        self._caught = {}
+        self._started = {}
+        self._hung = {}
+        self._slots = {}
+        self._free_slots = list(range(BOARD_SLOTS))
+        self._manifest = {}
+        self._memory_checked = time.monotonic()
+        self._batch_size = INITIAL_BATCH_SIZE
+        self._file_seconds = None
+
+        # Duplicate groups: representative -> held back files, and finished results
+        self._index = DuplicateIndex(self.input_dir) if self.duplicates else None
+        self._waiting = {}
+        self._resolved = {}
+        self._hash_pool = (
+            concurrent.futures.ThreadPoolExecutor(IO_THREADS, thread_name_prefix="prismpaper-hash")
+            if self._index is not None else None
+        )
+
+        self._journal, self._done = None, {}
+        if self.journal_dir and source.journaled:
+            self._open_journal()
+
+        source.start()
+        try:
+            # Skip spawning workers at all for an empty input
+            first = self._take(self._batch_size, wait=True, timeout=None)
+            if first:
+                # "All Colors" folders appear as files land, to avoid empty ones
+                prepare_output(
+                    self.output_dir, [] if "All Colors" in self.target_colors else self.target_colors
+                )
+                # Profiling needs a worker started for this run
+                own_pool = self.pool is None or self.profile_path
+                if own_pool:
+                    pool = WarmPool(self.max_workers, controls=(self._resume, self._runs),
+                                    profile=self.profile_path, warm=False)
+                else:
+                    pool = self.pool.start(self.max_workers)
+                self._pool = pool
+                try:
+                    if self.staged:
+                        self._run_staged(pool, context, first)
+                    else:
+                        self._run_pooled(pool, first)
+                finally:
+                    if own_pool:
+                        self._shutdown(pool)
+
+        except Exception as e:
+            self._status(f"Worker error: {e}")
+        finally:
+            source.stop()
+            if self._hash_pool is not None:
+                self._hash_pool.shutdown()
+            if self._journal is not None:
+                try:
+                    self._journal.close(complete=self.running and source.exhausted)
+                except OSError:
+                    pass
+
+        if self.cache_path:
+            try:
+                cache = ColorCache(self.cache_path)
+                cache.prune()
+                cache.close()
+            except Exception:
+                pass
+
+        self.summary["total"] = source.count
+        self.summary["elapsed"] = time.perf_counter() - start
+        self.summary["stats"] = self.stats.snapshot()
+        self.summary["slowest"] = self.stats.slowest()
+        if self.on_stats:
+            self.on_stats(self.summary["stats"])
+        if self.report_path:
+            try:
+                write_report(self.report_path, self.summary)
+            except OSError as e:
+                self._status(f"Could not write report: {e}")
+        if self.secondary == "manifest" and self._processed:
+            try:
+                write_report(os.path.join(self.output_dir, MANIFEST_NAME),
+                             {"share": self.secondary_share, "files": self._manifest})
+            except OSError as e:
+                self._status(f"Could not write the secondary color manifest: {e}")
+        return self.summary
+
+    def _wait(self, pending, window_full):
+        # While the scan is still feeding files, wake up regularly to top the
+        # window up instead of waiting for a result.
+        timeout = None if self.source.complete or window_full else SCAN_POLL_SECONDS
+        if self.file_timeout:
+            # ...and often enough for the watchdog to notice a stuck worker
+            timeout = min(timeout or WATCHDOG_POLL_SECONDS, WATCHDOG_POLL_SECONDS)
+        done, _ = concurrent.futures.wait(
+            pending, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        return done
+
+    def _shutdown(self, pool):
+        """Wind the pool down; after stop() without waiting for queued work."""
+        if self.running:
+            pool.shutdown(wait=True)
+        else:
+            # Workers drop their batch at the next file; give them a moment, then make sure
+            pool.terminate(STOP_GRACE_SECONDS)
+
+    def _window(self):
+        """Tasks to keep in flight for the number of workers currently wanted."""
+        reason = self.controller.update()
+        if reason:
+            self.summary["workers"] = self.controller.peak
+            self._status(f"Workers: {self.controller.active}/{self.max_workers} ({reason})")
+
+        now = time.monotonic()
+        if self.worker_memory and now - self._memory_checked >= MEMORY_CHECK_SECONDS:
+            self._memory_checked = now
+            if self._pool.memory() > self.worker_memory:
+                self._status(f"Workers: recycled (over {self.worker_memory / 1024**2:.0f} MB)")
+                self._pool.recycle()
+        return self.controller.active * TASKS_PER_WORKER
+
+    def _watchdog(self, pending):
+        """Kill the workers when a task runs far past the per-file time limit.
+
+        Catches decoders stuck in C code, which SIGALRM cannot interrupt, and
+        platforms without it; the killed tasks are retried like any crash,
+        the file the overdue task was decoding taking the blame. A task is
+        timed from when a worker picks it up (its first write to the board),
+        not counting time spent paused.
+        """
+        if not self.file_timeout or not self._resume.is_set():
+            return
+        now = time.monotonic()
+        for future, batch in pending.items():
+            if not self._pool.board[2 * self._slots[future]]:
+                continue
+            started = max(self._started.setdefault(future, now), self._resumed)
+            if now - started > self.file_timeout * (len(batch) + 1):
+                self._status("A worker stopped responding, restarting workers")
+                position = self._pool.board[2 * self._slots[future] + 1]
+                self._hung[future] = [batch[position - 1]] if position > 0 else list(batch)
+                self._started.clear()
+                self._pool.kill()
+                return
+
+    def _take(self, n, wait=False, timeout=SCAN_POLL_SECONDS):
+        """Next batch from the source, minus journaled files and exact duplicates.
+
+        With `wait`, keeps taking until something is left to process or the
+        source is exhausted.
+        """
+        while True:
+            names = self.source.take(n, wait=wait, timeout=timeout)
+            if self._done:
+                names = self._skip_done(names)
+            if names or not wait or self.source.exhausted or not self.running:
+                break
+        if self._index is None or not names:
+            return names
+
+        paths = [os.path.join(self.input_dir, name) for name in names]
+        reps = [self._index.exact(name, key) for name, key in zip(names, self._hash_pool.map(fingerprint, paths))]
+        unique = []
+        for name, rep, same in zip(names, reps, self._hash_pool.map(self._index.confirm, names, reps)):
+            if same:
+                self._hold(name, rep, "exact")
+            else:
+                unique.append(name)
+        return unique
+
+    def _submit(self, executor, pending, batch):
+        # The task reports on its board slot which file it is decoding; see _crashed
+        slot = self._free_slots.pop()
+        self._pool.board[2 * slot] = self._pool.board[2 * slot + 1] = 0
+        future = executor.submit(process_batch_worker, batch, self._task_context, slot)
+        pending[future] = batch
+        self._slots[future] = slot
+
+    def _run_pooled(self, executor, first):
+        source = self.source
+        pending = {}
+        self._submit(executor, pending, first)
+
+        # Keep a bounded window of tasks in flight and refill it as each
+        # one completes, so a slow image never holds back the others.
+        try:
+            while self.running:
+                max_in_flight = self._window()
+                while len(pending) < max_in_flight:
+                    if self._retry:
+                        # A file that took its worker down gets a task of its own
+                        batch = [self._retry.popleft()]
+                    elif self._requeue:
+                        batch = [self._requeue.popleft() for _ in range(min(self._batch_size, len(self._requeue)))]
+                    else:
+                        batch = self._take(self._batch_size, wait=not pending)
+                        if not batch:
+                            break
+                    self._submit(executor, pending, batch)
+
+                if not pending:
+                    if source.exhausted:
+                        break
+                    continue
+
+                for future in self._wait(pending, len(pending) >= max_in_flight):
+                    if self.checkpoint:
+                        self.checkpoint()
+                    if not self.running:
+                        break
+                    batch = pending.pop(future)
+                    slot = self._slots.pop(future)
+                    self._started.pop(future, None)
+                    timings = ()
+                    try:
+                        results, seconds, timings = future.result()
+                        self._adapt_batch_size(len(batch), seconds)
+                    except BrokenProcessPool:
+                        results = self._crashed(future, batch, slot)
+                    except Exception as e:
+                        results = self._failed(batch, e)
+                    self._free_slots.append(slot)
+                    self._collect(results, timings)
+                self._watchdog(pending)
+        finally:
+            # A warm pool outlives the run: leave nothing of it queued there
+            for future in pending:
+                future.cancel()
+
+    def _read_pool(self):
+        return concurrent.futures.ThreadPoolExecutor(IO_THREADS, thread_name_prefix="prismpaper-read")
+
+    def _submit_read(self, pending, names):
+        reading = {"file": None, "since": None}
+
+        def track(i):
+            reading["file"], reading["since"] = (None, None) if i is None else (names[i], time.monotonic())
+
+        future = self._reader.submit(_prefetch, self._context, names, self._index, track)
+        pending[future] = ("read", names)
+        self._reading[future] = reading
+
+    def _abandon_reads(self, pending):
+        """Give up on reads stuck on one file past the per-file time limit.
+
+        Decoding in the staged pipeline runs on threads of this process,
+        where neither SIGALRM nor killing the workers reaches it. The stuck
+        file fails, the rest of its batch is read again, and the stuck
+        thread is left to finish on its own while a fresh read pool takes
+        over. Returns the number of reads that ended with that.
+        """
+        if not self.file_timeout:
+            return 0
+        now = time.monotonic()
+        overdue = [
+            (future, reading["file"]) for future, reading in self._reading.items()
+            if reading["since"] is not None and now - reading["since"] > self.file_timeout and not future.done()
+        ]
+        if not overdue:
+            return 0
+
+        self._reader.shutdown(wait=False)
+        self._abandoned.append(self._reader)
+        self._reader = self._read_pool()
+        ended = 0
+        for future, stuck in overdue:
+            del self._reading[future]
+            _, names = pending.pop(future)
+            self._status(f"Gave up reading {stuck} after {self.file_timeout:g} s")
+            self._collect(self._failed([stuck], f"decoding took longer than {self.file_timeout:g} s"))
+            rest = [name for name in names if name != stuck]
+            if rest:
+                self.summary["retried"] += len(rest)
+                self._submit_read(pending, rest)
+            else:
+                ended += 1
+        # Reads queued on the old pool but not started yet move over too
+        for future, (stage, names) in list(pending.items()):
+            if stage == "read" and future.cancel():
+                del pending[future], self._reading[future]
+                self._submit_read(pending, names)
+        return ended
+
+    def _run_staged(self, executor, context, first):
+        source = self.source
+        pending = {}
+        in_flight = 0
+        self._reading = {}
+        self._abandoned = []
+        self._reader = self._read_pool()
+
+        with concurrent.futures.ThreadPoolExecutor(IO_THREADS, thread_name_prefix="prismpaper-place") as place_pool:
+            try:
+                self._submit_read(pending, first)
+                in_flight = 1
+
+                while self.running:
+                    # Batches anywhere in the pipeline; leaves room for prefetching ahead
+                    max_in_flight = self._window() + IO_THREADS
+                    while in_flight < max_in_flight:
+                        names = self._take(self._batch_size, wait=not pending)
+                        if not names:
+                            break
+                        self._submit_read(pending, names)
+                        in_flight += 1
+
+                    if not pending:
+                        if source.exhausted:
+                            break
+                        continue
+
+                    for future in self._wait(pending, in_flight >= max_in_flight):
+                        stage, payload = pending.pop(future)
+                        self._reading.pop(future, None)
+
+                        if stage == "place":
+                            if self.checkpoint:
+                                self.checkpoint()
+                            in_flight -= 1
+                            if not self.running:
+                                break
+                            try:
+                                results = future.result()
+                            except Exception as e:
+                                results = self._failed(payload["filenames"], e)
+                            self._collect(results, payload["timings"])
+                            continue
+
+                        try:
+                            if stage == "read":
+                                batch = future.result()
+                                for i, rep in batch["near"].items():
+                                    self._hold(batch["filenames"][i], rep, "near")
+                            else:
+                                batch, shm = payload
+                                _release(shm)
+                                colors, palettes, seconds = future.result()
+                                self._adapt_batch_size(len(batch["decoded"]), seconds)
+                                for i in batch["decoded"]:
+                                    batch["timings"][i]["cluster"] = seconds / len(batch["decoded"])
+                                _store_colors(context, batch, batch["decoded"], list(colors), palettes)
+                                batch["pixels"] = None
+
+                            if batch["pixels"] is not None:
+                                shm = _share_pixels(batch["pixels"])
+                                task = executor.submit(
+                                    cluster_shared_worker, shm.name, batch["pixels"].shape, self._task_context
+                                )
+                                pending[task] = ("cluster", (batch, shm))
+                            else:
+                                pending[place_pool.submit(_place_batch, context, batch)] = ("place", batch)
+
+                        except BrokenProcessPool:
+                            # Only the clustering runs in the workers; give the stack one more go
+                            batch = payload[0]
+                            if batch.get("crashed"):
+                                in_flight -= 1
+                                self._collect(self._failed(batch["filenames"], "worker process crashed"))
+                                continue
+                            batch["crashed"] = True
+                            self.summary["retried"] += len(batch["decoded"])
+                            shm = _share_pixels(batch["pixels"])
+                            task = executor.submit(
+                                cluster_shared_worker, shm.name, batch["pixels"].shape, self._task_context
+                            )
+                            pending[task] = ("cluster", (batch, shm))
+
+                        except Exception as e:
+                            in_flight -= 1
+                            names = payload if stage == "read" else payload[0]["filenames"]
+                            self._collect(self._failed(names, e))
+                    in_flight -= self._abandon_reads(pending)
+            finally:
+                for future, (stage, payload) in pending.items():
+                    future.cancel()
+                    if stage == "cluster":
+                        _release(payload[1])
+                # Threads stuck in a decode are not waited for
+                self._reader.shutdown(wait=True)
+
+    # ---------- HELPER ----------
+    def _adapt_batch_size(self, batch_len, seconds):
+        """Size batches so one task takes about TARGET_TASK_SECONDS."""
+        per_file = seconds / max(1, batch_len)
+        if self._file_seconds is None:
+            self._file_seconds = per_file
+        else:
+            self._file_seconds = 0.8 * self._file_seconds + 0.2 * per_file
+
+        if self._file_seconds > 0:
+            ideal = int(TARGET_TASK_SECONDS / self._file_seconds)
+            self._batch_size = max(1, min(MAX_BATCH_SIZE, ideal))
+
+    def _record(self, filename, success, info, secondary=()):
+        summary = self.summary
+        summary["processed"] += 1
+        if success:
+            summary["placed"] += 1
+            summary["classes"][info] = summary["classes"].get(info, 0) + 1
+            for name in secondary:
+                summary["secondary"][name] = summary["secondary"].get(name, 0) + 1
+            if secondary and self.secondary == "manifest":
+                self._manifest[filename] = {"class": info, "secondary": list(secondary)}
+        elif info is None:
+            summary["skipped"] += 1
+        else:
+            summary["failed"] += 1
+            summary["errors"].append({"file": filename, "error": info})
+
+    def _failed(self, filenames, error):
+        return [(f, False, str(error) or type(error).__name__) for f in filenames]
+
+    def _crashed(self, future, batch, slot):
+        """Files of a task that failed because a worker died or was killed.
+
+        One worker going down breaks the whole pool. The file that took its
+        worker down, as read from the task's board slot, gets a task of its
+        own and fails after MAX_CRASHES; the files that were only caught up
+        in it go back to the normal batches. A worker that went down outside
+        a decode leaves every file of its task under suspicion. Tasks no
+        worker had picked up yet are simply submitted again.
+        """
+        board = self._pool.board
+        pid, position = board[2 * slot], board[2 * slot + 1]
+        if not pid:
+            self._hung.pop(future, None)
+            self._requeue.extend(batch)
+            return []
+        hung = future in self._hung
+        if hung:
+            suspects = self._hung.pop(future)
+        elif self._pool.died(pid):
+            suspects = [batch[position - 1]] if position > 0 else list(batch)
+        else:
+            suspects = []
+
+        failed = []
+        for name in batch:
+            if name not in suspects:
+                caught = self._caught[name] = self._caught.get(name, 0) + 1
+                if caught < MAX_CAUGHT:
+                    self._requeue.append(name)
+                    continue
+            crashes = self._crashes[name] = self._crashes.get(name, 0) + 1
+            if crashes >= MAX_CRASHES:
+                failed.append(name)
+            else:
+                self._retry.append(name)
+        retried = len(batch) - len(failed)
+        self.summary["retried"] += retried
+        if retried and suspects:
+            self._status(f"A worker process died, retrying {retried} file(s)")
+        if hung:
+            return self._failed(failed, f"worker stopped responding on this file (limit {self.file_timeout:g} s)")
+        return self._failed(failed, "worker process crashed on this file")
+
+    # ---------- JOURNAL ----------
+    def _open_journal(self):
+        settings = {
+            "placement": self.summary["placement"],
+            "targets": sorted(self.target_colors),
+            "accuracy": self.accuracy_settings,
+            "mirror": self.mirror,
+        }
+        if self.prefilter == "fast":
+            # May skip files a full analysis places; strict never does
+            settings["prefilter"] = "fast"
+        if self.secondary:
+            settings["secondary"] = [self.secondary, self.secondary_share]
+        path = os.path.join(self.journal_dir, job_key(self.input_dir, self.output_dir, settings) + ".jsonl")
+        journal = Journal(path, {"input": os.path.abspath(self.input_dir), "output": os.path.abspath(self.output_dir)})
+        try:
+            self._done = journal.load() if self.resume_journal else {}
+            journal.open(fresh=not self.resume_journal)
+        except OSError as e:
+            self._status(f"Progress journal unavailable: {e}")
+            self._done = {}
+            return
+        self._journal = journal
+        if self._done:
+            self._status(f"Resuming: {len(self._done)} files already done")
+
+    def _skip_done(self, names):
+        """Count files finished by an earlier run of this job as done again.
+
+        Only while the input is unchanged since it was journaled; a moved
+        file has no input left, its copy in the output has to be there.
+        """
+        remaining, resumed = [], []
+        for name in names:
+            entry = self._done.pop(name, None)
+            if entry is not None:
+                status, class_name, secondary, recorded = entry
+                src = os.path.join(self.input_dir, name)
+                current = file_signature(src)
+                unchanged = recorded is not None and current == recorded
+                # A placed file only counts if it is still in the output
+                folder = os.path.join(self.output_dir, class_name or "")
+                dst = os.path.join(folder, name if self.mirror else os.path.basename(name))
+                if status == "skipped":
+                    trusted = unchanged
+                else:
+                    trusted = os.path.lexists(dst) and (unchanged or current is None)
+                if trusted:
+                    result = (name, status == "placed", class_name if status == "placed" else None)
+                    resumed.append(result + ((secondary,) if secondary else ()))
+                    continue
+            remaining.append(name)
+        if resumed:
+            self.summary["resumed"] += len(resumed)
+            self._collect(resumed, journal=False)
+        return remaining
+
+    def _collect(self, results, timings=(), journal=True):
+        for timing in timings:
+            self.stats.add(timing)
+        if self.on_stats and timings:
+            now = time.perf_counter()
+            if now - self._stats_sent >= STATS_INTERVAL:
+                self._stats_sent = now
+                self.on_stats(self.stats.snapshot())
+
+        for result in results:
+            self._record(*result)
+            self._processed += 1
+            filename, success, info = result[:3]
+            if journal and self._journal is not None and (success or info is None):
+                try:
+                    self._journal.record(
+                        filename, "placed" if success else "skipped", info,
+                        result[3] if len(result) > 3 else None,
+                        file_signature(os.path.join(self.input_dir, filename)),
+                    )
+                except OSError:
+                    pass
+            if self.on_progress:
+                self.on_progress(self._processed, max(self._processed, self.source.count))
+
+            if self._index is not None:
+                filename = result[0]
+                self._resolved[filename] = result
+                waiting = self._waiting.pop(filename, ())
+                if waiting:
+                    self._collect([self._duplicate_result(name, result) for name in waiting])
+
+    # ---------- DUPLICATES ----------
+    def _hold(self, filename, rep, kind):
+        """Keep a duplicate out of the analysis until its representative is done."""
+        self.summary["duplicates"].append({"file": filename, "of": rep, "kind": kind})
+        if rep in self._resolved:
+            self._collect([self._duplicate_result(filename, self._resolved[rep])])
+        else:
+            self._waiting.setdefault(rep, []).append(filename)
+
+    def _duplicate_result(self, filename, rep_result):
+        _, success, info = rep_result[:3]
+        if not success:
+            # Same content: skipped or failed like its representative
+            return (filename, False, info)
+        if self.duplicates == "skip":
+            return (filename, False, None)
+        src = os.path.join(self.input_dir, filename)
+        secondary = list(rep_result[3]) if len(rep_result) > 3 else []
+        return _place_file(self._context, filename, src, None, info, None, None, secondary=secondary)
+
+
+def _release(shm):
+    try:
+        shm.close()
+        shm.unlink()
+    except Exception:
+        pass
@@ -0,0 +1,163 @@
+"""Placing sorted files into the output: move, copy and zero-copy links."""
+import os
+import sys
+import errno
+import shutil
+
+STRATEGIES = ("move", "auto", "copy", "reflink", "hardlink", "symlink")
+
+# Strategies tried in order; "copy" always works and ends every chain
+_CHAINS = {
+    "auto": ("reflink", "copy"),
+    "copy": ("copy",),
+    "reflink": ("reflink", "copy"),
+    "hardlink": ("hardlink", "reflink", "copy"),
+    "symlink": ("symlink", "copy"),
+}
+# Only possible when source and destination live on the same filesystem
+_SAME_DEVICE_ONLY = {"reflink", "hardlink"}
+_UNSUPPORTED_ERRNOS = {
+    errno.EXDEV, errno.EPERM, errno.EINVAL, errno.ENOTTY, errno.EBADF,
+    getattr(errno, "ENOTSUP", errno.EOPNOTSUPP), errno.EOPNOTSUPP, errno.ENOSYS,
+}
+
+# (method, src device, dst device) pairs already known not to work
+_unsupported = set()
+# Output folders this process has already created or seen
+_known_dirs = set()
+
+FICLONE = 0x40049409  # Linux ioctl: share the source extents copy-on-write
+COPY_CHUNK = 64 * 1024 * 1024
+
+
+# --------------------- PRIMITIVES ---------------------
+def reflink(src, dst):
+    """Copy-on-write clone (btrfs/XFS/bcachefs on Linux, APFS on macOS)."""
+    if sys.platform.startswith("linux"):
+        import fcntl
+
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            except OSError:
+                fdst.close()
+                os.unlink(dst)
+                raise
+    elif sys.platform == "darwin":
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), dst)
+    else:
+        raise OSError(errno.EOPNOTSUPP, "reflink not supported on this platform", dst)
+    shutil.copystat(src, dst)
+
+
+def hardlink(src, dst):
+    os.link(src, dst)
+
+
+def symlink(src, dst):
+    os.symlink(os.path.abspath(src), dst)
+
+
+def fast_copy(src, dst):
+    """Full copy, letting the kernel move the bytes where it can.
+
+    copy_file_range allows server-side copies on NFS/SMB mounts and in-kernel
+    copies elsewhere; shutil.copyfile already uses sendfile (Linux) or
+    fcopyfile (macOS) when it is not available.
+    """
+    copy_range = getattr(os, "copy_file_range", None)
+    if copy_range is not None:
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                size = os.fstat(fsrc.fileno()).st_size
+                offset = 0
+                while offset < size:
+                    sent = copy_range(fsrc.fileno(), fdst.fileno(), min(COPY_CHUNK, size - offset))
+                    if sent == 0:
+                        break
+                    offset += sent
+                if offset < size:
+                    raise OSError(errno.EIO, "short copy", dst)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_ERRNOS and e.errno != errno.EIO:
+                raise
+            shutil.copyfile(src, dst)
+    else:
+        shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+
+
+_METHODS = {"reflink": reflink, "hardlink": hardlink, "symlink": symlink, "copy": fast_copy}
+
+
+# --------------------- PLACEMENT ---------------------
+def same_device(src, dst_dir):
+    try:
+        return os.stat(src).st_dev == os.stat(dst_dir).st_dev
+    except OSError:
+        return False
+
+
+def place(src, dst, strategy="copy"):
+    """Put `src` at `dst` with `strategy`, falling back along its chain.
+
+    Returns the method actually used. An existing destination is replaced,
+    unless it already is the same file (e.g. a hard link from a previous run).
+    """
+    if strategy == "move":
+        shutil.move(src, dst)
+        return "move"
+
+    if os.path.lexists(dst):
+        try:
+            if os.path.samefile(src, dst):
+                return "existing"
+        except OSError:
+            pass
+        os.unlink(dst)
+
+    try:
+        devices = (os.stat(src).st_dev, os.stat(os.path.dirname(dst) or ".").st_dev)
+    except OSError:
+        devices = (None, None)
+    cross_device = devices[0] != devices[1]
+
+    for method in _CHAINS.get(strategy, ("copy",)):
+        if method != "copy":
+            if cross_device and method in _SAME_DEVICE_ONLY:
+                continue
+            if (method,) + devices in _unsupported:
+                continue
+        try:
+            _METHODS[method](src, dst)
+            return method
+        except OSError as e:
+            if method == "copy" or e.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            _unsupported.add((method,) + devices)
+
+    raise OSError(errno.EOPNOTSUPP, f"no placement method for {strategy}", dst)
+
+
+def ensure_dir(path):
+    """makedirs that only touches the filesystem once per folder and process."""
+    if path not in _known_dirs:
+        os.makedirs(path, exist_ok=True)
+        _known_dirs.add(path)
+
+
+def forget_dirs():
+    """Start over with ensure_dir: the output may have been emptied since an earlier run."""
+    _known_dirs.clear()
+
+
+def prepare_output(output_dir, folder_names):
+    """Start a run: create the class folders up front instead of once per file."""
+    forget_dirs()
+    for name in folder_names:
+        ensure_dir(os.path.join(output_dir, name))
@@ -0,0 +1,184 @@
+"""Worker processes that outlive a single sorting run."""
+import time
+import signal
+import threading
+import concurrent.futures
+import multiprocessing
+from concurrent.futures.process import BrokenProcessPool
+import psutil
+from controller import worker_bounds
+
+RECYCLE_AFTER = 500  # tasks per process before the pool is replaced
+BOARD_SLOTS = 1024  # tasks a job can have in flight on one pool
+
+
+# --------------------- WARM POOL ---------------------
+class WarmPool:
+    """Process pool for SortJobs that replaces its processes when needed.
+
+    Started once, e.g. right after the GUI window appears, so the workers
+    have started and imported the clustering engine before the first run;
+    a SortJob given the pool submits its tasks here instead of starting
+    processes of its own (a job without one runs on a private, unwarmed
+    WarmPool). The settings of a run travel with each task; only the
+    (resume, run counter) controls are handed to the processes when they
+    start, and are shared by every run.
+
+    The processes are replaced when a run needs a different number of them,
+    after RECYCLE_AFTER tasks each, on recycle() (e.g. once they hold too
+    much memory) and after one of them died: submit() starts a fresh pool
+    instead of failing with BrokenProcessPool. Replaced processes finish the
+    tasks they were already given.
+
+    `board` is shared with every process: a task given a slot writes its
+    worker's pid and the file it is decoding there (see
+    pipeline._board_tracker), so after a crash the job can tell which file
+    took its worker down, together with died().
+    """
+
+    def __init__(self, max_workers=None, recycle_after=RECYCLE_AFTER, controls=None, profile=None, warm=True):
+        self.max_workers = max_workers or worker_bounds(False)[1]
+        self.recycle_after = recycle_after
+        if controls is None:
+            resume = multiprocessing.Event()
+            resume.set()
+            controls = (resume, multiprocessing.Value("i", 0))
+        self.controls = controls
+        self.warm = warm
+        self.board = multiprocessing.RawArray("q", 2 * BOARD_SLOTS)
+
+        # With a profile path the first process of the pool runs under cProfile
+        self._init = {"controls": controls, "profile": profile, "board": self.board}
+        self._profile_claim = multiprocessing.Value("b", 0) if profile else None
+        self._executor = None
+        self._retired = []
+        self._exitcodes = {}  # pid -> exit code of processes no longer tracked
+        self._tasks = 0
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._executor is not None
+
+    def start(self, max_workers=None):
+        """Start and warm up the processes, or resize the pool to `max_workers`."""
+        with self._lock:
+            if max_workers and max_workers != self.max_workers:
+                self.max_workers = max_workers
+                self._retire()
+            if self._executor is None:
+                self._spawn()
+        return self
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._executor is None:
+                self._spawn()
+            elif self._tasks >= self.recycle_after * self.max_workers:
+                self._retire()
+                self._spawn()
+            self._tasks += 1
+            try:
+                return self._executor.submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (killed, out of memory, crashed in a decoder): start over
+                self._retire()
+                self._spawn()
+                return self._executor.submit(fn, *args)
+
+    def recycle(self):
+        """Replace the processes; the current ones exit once their tasks are done."""
+        with self._lock:
+            if self._executor is not None:
+                self._retire()
+
+    def kill(self):
+        """Terminate the current processes, e.g. one stuck in a decoder.
+
+        Their unfinished tasks fail with BrokenProcessPool; the next submit()
+        starts new processes.
+        """
+        with self._lock:
+            processes = self._processes(self._executor)
+        for process in processes:
+            process.terminate()
+
+    def died(self, pid):
+        """Whether worker `pid` ended by itself (crashed, killed by the system).
+
+        Processes the pool ends itself, by kill(), terminate() or when a
+        broken pool takes the others down, exit with SIGTERM and do not count.
+        """
+        with self._lock:
+            processes = self._retired + self._processes(self._executor)
+            exitcode = self._exitcodes.get(pid)
+        for process in processes:
+            if process.pid == pid:
+                exitcode = process.exitcode
+        return exitcode not in (None, 0, -signal.SIGTERM)
+
+    def memory(self):
+        """Largest resident set size of a live worker process, in bytes."""
+        with self._lock:
+            processes = self._processes(self._executor)
+        largest = 0
+        for process in processes:
+            try:
+                largest = max(largest, psutil.Process(process.pid).memory_info().rss)
+            except (psutil.Error, ValueError):
+                pass
+        return largest
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, retired = self._executor, self._retired
+            self._executor, self._retired = None, []
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+        if wait:
+            for process in retired:
+                process.join()
+
+    def terminate(self, grace=0.0):
+        """Shut down without waiting for queued work; processes still busy after `grace` are killed."""
+        with self._lock:
+            processes = self._retired + self._processes(self._executor)
+        self.shutdown(wait=False)
+        deadline = time.monotonic() + grace
+        for process in processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    # ---------- HELPER ----------
+    def _spawn(self):
+        # Imported here: the pipeline runs its jobs on this class
+        from pipeline import init_worker, warm_worker
+
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=init_worker, initargs=(self._init, self._profile_claim)
+        )
+        self._tasks = 0
+        if self.warm:
+            # One warm-up task per process gets them all started now, not on the first batch
+            for _ in range(self.max_workers):
+                self._executor.submit(warm_worker)
+
+    def _retire(self):
+        # Kept so terminate() can still reach them; the executor forgets them on shutdown
+        if len(self._exitcodes) > BOARD_SLOTS:
+            self._exitcodes.clear()
+        for process in self._retired:
+            if not process.is_alive():
+                self._exitcodes[process.pid] = process.exitcode
+        self._retired = [p for p in self._retired if p.is_alive()]
+        if self._executor is not None:
+            self._retired.extend(self._processes(self._executor))
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @staticmethod
+    def _processes(executor):
+        return list((getattr(executor, "_processes", None) or {}).values())
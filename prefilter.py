@@ -0,0 +1,102 @@
+"""Cheap target-color check that spares clustering for images that cannot match.
+
+Every center a clustering engine can return is the mean of some of the
+sampled pixels (KMeans clusters, histogram bins, the all-pixel fallback), so
+it lies in the convex hull of the sample. reachable_classes() bounds what
+any point of that hull can classify as; an image whose bounds miss every
+selected class is skipped without clustering. The "strict" mode only uses
+those bounds and never drops an image the full analysis would have placed.
+The "fast" mode also requires a minimum share of thumbnail pixels in a
+selected class, which rules out far more images but can miss an image whose
+dominant color is a mix of pixels of other classes.
+"""
+import numpy as np
+from core import COLOR_CLASSES, _HUE_EDGES, classify_color_indices, rgb_to_hsv
+
+PREFILTER_MODES = ("strict", "fast")
+FAST_THUMBNAIL = 16 * 16  # pixels looked at by the fast mode
+FAST_MIN_SHARE = 0.05
+HUE_MARGIN = 1.0  # degrees, absorbs rounding between the sample and a computed center
+
+# Same thresholds as core.classify_color, on the 0-255 scale
+_S_GRAY = 0.15
+_V_BLACK = 0.2 * 255
+_V_WHITE = 0.90 * 255
+
+# Hue arcs (start, length in degrees) of the eight hue classes, Red wrapping around 0
+_HUE_CLASSES = {
+    COLOR_CLASSES[k]: (float(_HUE_EDGES[k - 1]), float((_HUE_EDGES[k] - _HUE_EDGES[k - 1]) % 360))
+    for k in range(8)
+}
+
+
+def _arcs_overlap(a, b):
+    (start_a, len_a), (start_b, len_b) = a, b
+    return (start_b - start_a) % 360 <= len_a or (start_a - start_b) % 360 <= len_b
+
+
+def _hue_arc(hues):
+    """Smallest arc (start, length) holding every hue, or None if it spans half the circle."""
+    hues = np.unique(hues)
+    if hues.size == 1:
+        return float(hues[0]), 0.0
+    gaps = np.diff(np.append(hues, hues[0] + 360))
+    widest = int(gaps.argmax())
+    length = 360 - float(gaps[widest])
+    # Points spread over a half-plane or more may average to any hue
+    if length >= 180:
+        return None
+    return float(hues[(widest + 1) % hues.size]), length
+
+
+def reachable_classes(pixels):
+    """Classes any mean of some of `pixels` ((N, 3) uint8) can be classified as.
+
+    Uses bounds that hold for every point of the convex hull: V is at least
+    the largest per-channel minimum and the smallest pixel brightness, at
+    most the largest pixel V; the smallest channel is at most the smallest
+    per-channel maximum; chroma (max - min) is at most the largest pixel
+    chroma; and the hue stays inside the smallest arc holding every pixel
+    hue when that arc is under 180 degrees.
+    """
+    px = np.asarray(pixels, dtype=np.float64).reshape(-1, 3)
+    maxc, minc = px.max(axis=1), px.min(axis=1)
+    chroma = maxc - minc
+    v_lo = max(px.min(axis=0).max(), px.mean(axis=1).min())
+    v_hi = maxc.max()
+    min_hi = px.max(axis=0).min()
+
+    classes = set()
+    if v_lo < _V_BLACK:
+        classes.add("Black")
+    if v_hi > _V_WHITE and min_hi > _V_WHITE * (1 - _S_GRAY):
+        classes.add("White")
+    if v_hi >= _V_BLACK and v_lo <= _V_WHITE:
+        classes.add("Gray")
+
+    # A hue class needs s >= 0.15, i.e. chroma >= 0.15 * V >= 0.15 * v_lo
+    colored = chroma > 0
+    if chroma.max() >= _S_GRAY * v_lo and colored.any():
+        h, _, _ = rgb_to_hsv(px[colored])
+        arc = _hue_arc(h * 360)
+        for name, class_arc in _HUE_CLASSES.items():
+            if arc is None or _arcs_overlap((arc[0] - HUE_MARGIN, arc[1] + 2 * HUE_MARGIN), class_arc):
+                classes.add(name)
+    return classes
+
+
+def likely_classes(pixels):
+    """reachable_classes() narrowed to classes holding FAST_MIN_SHARE of a thumbnail's pixels."""
+    px = np.asarray(pixels).reshape(-1, 3)
+    thumb = px[::max(1, len(px) // FAST_THUMBNAIL)]
+    counts = np.bincount(classify_color_indices(thumb), minlength=len(COLOR_CLASSES))
+    common = {COLOR_CLASSES[i] for i in np.flatnonzero(counts >= FAST_MIN_SHARE * len(thumb))}
+    return common & reachable_classes(px)
+
+
+def plausible(pixels, target_colors, mode="strict"):
+    """False if the image cannot (strict) or is unlikely to (fast) be classified into a target."""
+    if "All Colors" in target_colors:
+        return True
+    classes = likely_classes(pixels) if mode == "fast" else reachable_classes(pixels)
+    return not classes.isdisjoint(target_colors)
@@ -0,0 +1,146 @@
+"""Streaming discovery of input images."""
+import os
+import threading
+from collections import deque
+from fnmatch import fnmatch
+
+SUPPORTED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+
+
+def _matches(rel_path, name, patterns):
+    rel_path = rel_path.replace(os.sep, "/")
+    return any(fnmatch(rel_path, p) or fnmatch(name, p) for p in patterns)
+
+
+def scan_images(root, recursive=True, include=None, exclude=None, skip_dirs=(), stopped=None):
+    """Yield paths (relative to `root`) of supported images as they are found.
+
+    Uses os.scandir so file types come from the directory listing without an
+    extra stat per entry. `include`/`exclude` are glob patterns matched
+    against the relative path or the bare name; excluded folders are pruned.
+    `skip_dirs` are absolute folders never descended into (e.g. the output).
+    The scan ends early once `stopped()` returns True, checked per folder.
+    """
+    skip = {os.path.normcase(os.path.abspath(d)) for d in skip_dirs if d}
+    stack = [""]
+
+    while stack:
+        if stopped is not None and stopped():
+            return
+        rel_dir = stack.pop()
+        try:
+            listing = os.scandir(os.path.join(root, rel_dir))
+        except OSError:
+            continue
+
+        subdirs = []
+        with listing:
+            for entry in listing:
+                rel = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and os.path.normcase(os.path.abspath(entry.path)) not in skip:
+                            if not (exclude and _matches(rel, entry.name, exclude)):
+                                subdirs.append(rel)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+
+                if not entry.name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    continue
+                if include and not _matches(rel, entry.name, include):
+                    continue
+                if exclude and _matches(rel, entry.name, exclude):
+                    continue
+                yield rel
+
+        # Depth-first, but visit sub-folders in listing order
+        stack.extend(reversed(subdirs))
+
+
+# --------------------- FILE SOURCES ---------------------
+class ListSource:
+    """A fixed list of relative paths, with the same interface as ScanSource."""
+
+    journaled = True
+
+    def __init__(self, files):
+        self._items = deque(files)
+        self.count = len(self._items)
+        self.complete = True
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def take(self, n, wait=False, timeout=0.1):
+        return [self._items.popleft() for _ in range(min(n, len(self._items)))]
+
+    @property
+    def exhausted(self):
+        return not self._items
+
+
+class ScanSource:
+    """Runs scan_images() on a background thread so work can start immediately.
+
+    `count` is the number of files found so far and `complete` turns True once
+    the scan has finished; take() hands out up to `n` queued paths.
+    `journaled` sources end on their own, so a SortJob over one keeps a
+    progress journal to resume from.
+    """
+
+    journaled = True
+
+    def __init__(self, root, recursive=True, include=None, exclude=None, skip_dirs=()):
+        self.root = root
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.skip_dirs = skip_dirs
+
+        self.count = 0
+        self.complete = False
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="prismpaper-scan", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        with self._cond:
+            self._cond.notify_all()
+
+    def _run(self):
+        try:
+            for rel in scan_images(self.root, self.recursive, self.include, self.exclude, self.skip_dirs,
+                                   lambda: self._stopped):
+                if self._stopped:
+                    break
+                with self._cond:
+                    self._items.append(rel)
+                    self.count += 1
+                    self._cond.notify()
+        finally:
+            with self._cond:
+                self.complete = True
+                self._cond.notify_all()
+
+    def take(self, n, wait=False, timeout=0.1):
+        """Pop up to `n` paths; with `wait`, block up to `timeout` for the first one."""
+        with self._cond:
+            if wait and not self._items and not self.complete and not self._stopped:
+                self._cond.wait(timeout)
+            return [self._items.popleft() for _ in range(min(n, len(self._items)))]
+
+    @property
+    def exhausted(self):
+        return self.complete and not self._items
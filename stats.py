@@ -0,0 +1,206 @@
+"""Per-stage timing histograms, live progress and the end-of-run report."""
+import os
+import json
+import math
+import time
+import heapq
+import threading
+
+from cache import default_cache_path
+
+STAGES = ("lookup", "decode", "resize", "prefilter", "cluster", "classify", "place")
+PERCENTILES = (50, 95, 99)
+DEFAULT_SLOWEST = 10
+REPORT_NAME = "prismpaper-report.json"
+RATE_TIME_CONSTANT = 5.0  # seconds after which the throughput average has mostly forgotten a speed
+
+# Log-spaced buckets from 1 µs to ~100 s, 20 per decade (about 12% wide)
+_BUCKETS_PER_DECADE = 20
+_MIN_SECONDS = 1e-6
+_N_BUCKETS = 8 * _BUCKETS_PER_DECADE + 1
+
+
+def new_timing(filename):
+    """Per-file record filled in by the pipeline stages."""
+    timing = dict.fromkeys(STAGES, 0.0)
+    timing.update(file=filename, bytes_read=0, bytes_written=0, filtered=False)
+    return timing
+
+
+class Histogram:
+    """Fixed-size log histogram; memory does not grow with the number of files."""
+
+    def __init__(self):
+        self.counts = [0] * _N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds <= _MIN_SECONDS:
+            bucket = 0
+        else:
+            bucket = min(_N_BUCKETS - 1, 1 + int(math.log10(seconds / _MIN_SECONDS) * _BUCKETS_PER_DECADE))
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p):
+        """Upper edge of the bucket holding the p-th percentile."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for bucket, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.max, _MIN_SECONDS * 10 ** (bucket / _BUCKETS_PER_DECADE))
+        return self.max
+
+    def summary(self):
+        out = {
+            "count": self.count,
+            "total": round(self.total, 4),
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+        }
+        for p in PERCENTILES:
+            out[f"p{p}"] = round(self.percentile(p), 6)
+        return out
+
+
+class RunStats:
+    """Aggregates per-file timings from all workers of one run."""
+
+    def __init__(self, slowest=DEFAULT_SLOWEST):
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.per_file = Histogram()
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.filtered = 0
+        self.slowest_n = slowest
+        self._slowest = []
+        self._seq = 0
+
+    def add(self, timing):
+        total = 0.0
+        for stage in STAGES:
+            seconds = timing.get(stage, 0.0)
+            if seconds:
+                self.stages[stage].add(seconds)
+                total += seconds
+        self.per_file.add(total)
+        self.bytes_read += timing.get("bytes_read", 0)
+        self.bytes_written += timing.get("bytes_written", 0)
+        self.filtered += bool(timing.get("filtered"))
+
+        if self.slowest_n:
+            self._seq += 1
+            item = (total, self._seq, timing)
+            if len(self._slowest) < self.slowest_n:
+                heapq.heappush(self._slowest, item)
+            elif total > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def snapshot(self):
+        return {
+            "files": self.per_file.count,
+            "per_file": self.per_file.summary(),
+            "stages": {stage: h.summary() for stage, h in self.stages.items()},
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+            # Ruled out by the target-color prefilter without clustering
+            "filtered": self.filtered,
+        }
+
+    def slowest(self):
+        """The slowest files, slowest first, with their per-stage seconds."""
+        return [
+            dict(timing, total=round(total, 6))
+            for total, _, timing in sorted(self._slowest, key=lambda item: -item[0])
+        ]
+
+
+class ProgressMeter:
+    """Position, tallies, throughput and time left of a running job.
+
+    update() is called from the job's thread for every file and only stores
+    the numbers; snapshot() is called from another thread a few times a
+    second and works out the rest, so a display costs nothing per file.
+    The throughput is an exponentially weighted moving average over about
+    RATE_TIME_CONSTANT seconds, sampled by each snapshot, so the time left
+    follows speed changes (cache hits, slow folders) without jumping with
+    every file. Time spent paused counts for neither.
+    """
+
+    def __init__(self, time_constant=RATE_TIME_CONSTANT):
+        self.time_constant = time_constant
+        self.version = 0  # changes with every update()
+        self._processed = 0
+        self._total = 0
+        self._counts = {}
+        self._start = time.monotonic()
+        self._paused_at = None
+        self._paused = 0.0
+        self._sample = (0.0, 0)  # (active seconds, processed) when the rate was last sampled
+        self._rate = None
+        self._lock = threading.Lock()
+
+    def update(self, processed, total, counts=None):
+        """Record the job's position; `counts` (placed/skipped/failed and "classes") when given."""
+        with self._lock:
+            self._processed, self._total = processed, total
+            if counts is not None:
+                self._counts = counts
+            self.version += 1
+
+    def pause(self):
+        with self._lock:
+            if self._paused_at is None:
+                self._paused_at = time.monotonic()
+
+    def resume(self):
+        with self._lock:
+            if self._paused_at is not None:
+                self._paused += time.monotonic() - self._paused_at
+                self._paused_at = None
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = (self._paused_at or time.monotonic()) - self._start - self._paused
+            processed, total = self._processed, max(self._total, self._processed)
+            counts = self._counts
+
+            seen_at, seen = self._sample
+            if not processed:
+                # Pool start-up is not throughput: measure from the first file on
+                self._sample = (elapsed, 0)
+            elif elapsed > seen_at:
+                rate = (processed - seen) / (elapsed - seen_at)
+                weight = 1.0 - math.exp(-(elapsed - seen_at) / self.time_constant)
+                self._rate = rate if self._rate is None else self._rate + weight * (rate - self._rate)
+                self._sample = (elapsed, processed)
+            rate = self._rate
+
+        return dict(
+            counts,
+            processed=processed,
+            total=total,
+            percent=int(processed / total * 100) if total else 0,
+            elapsed=elapsed,
+            rate=rate or 0.0,
+            eta=(total - processed) / rate if rate else None,
+        )
+
+
+def default_report_path():
+    """Where the GUI keeps the report of its last run: next to the cache, not in the sorted output."""
+    return os.path.join(os.path.dirname(default_cache_path()), REPORT_NAME)
+
+
+def write_report(path, summary):
+    """Write a run summary (with its "stats" and "slowest" entries) as JSON."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
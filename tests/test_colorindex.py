@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pytest
+
+from cache import ColorCache
+from colorindex import ColorIndex, rgb_to_lab
+
+
+def _random_index(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    colors = rng.integers(0, 256, (n, 3)).astype(float)
+    extra = rng.integers(0, 256, (n, 3)).astype(float)
+    shares = rng.uniform(0.02, 0.5, n)
+    entries = [
+        (f"/img/{i:05d}.png", tuple(colors[i]), [(tuple(extra[i]), float(shares[i]))], (i, i))
+        for i in range(n)
+    ]
+    return ColorIndex.build(entries), colors, extra, shares
+
+
+def _brute_force(index, query, palette=False, min_share=0.0):
+    """Distance of every image to `query` over all its rows, closest first."""
+    lab = rgb_to_lab(np.asarray(query, dtype=np.float64)).astype(np.float32)
+    dist = np.sqrt(((index.lab - lab) ** 2).sum(axis=1))
+    keep = index.primary | (palette & (index.weight >= min_share))
+    best = {}
+    for image, d in zip(index.image[keep], dist[keep]):
+        best[int(image)] = min(best.get(int(image), np.inf), float(d))
+    return sorted(best.items(), key=lambda item: item[1])
+
+
+@pytest.mark.parametrize("query", [(255, 136, 0), (10, 10, 10), (128, 200, 255), (250, 250, 250)])
+@pytest.mark.parametrize("palette", [False, True])
+def test_nearest_matches_brute_force(query, palette):
+    index, *_ = _random_index()
+    expected = _brute_force(index, query, palette, 0.2)[:25]
+    got = index.nearest(query, 25, palette, 0.2)
+    assert [round(d, 4) for _, _, d in got] == pytest.approx([round(d, 4) for _, d in expected], abs=1e-3)
+    assert {index.path(i) for i, _ in expected[:20]} <= {p for p, _, _ in got}
+
+
+@pytest.mark.parametrize("radius", [2.0, 10.0, 35.0])
+@pytest.mark.parametrize("palette", [False, True])
+def test_within_matches_brute_force(radius, palette):
+    index, *_ = _random_index()
+    query = (40, 90, 160)
+    expected = {index.path(i) for i, d in _brute_force(index, query, palette, 0.2) if d <= radius}
+    got = index.within(query, radius, palette=palette, min_share=0.2)
+    assert {p for p, _, _ in got} == expected
+    assert [d for _, _, d in got] == sorted(d for _, _, d in got)
+
+
+def test_rebuild_keeps_images_that_left_the_cache(tmp_path):
+    cache_path, index_path = str(tmp_path / "colors.sqlite"), str(tmp_path / "index.npz")
+    images = []
+    for name, rgb in (("a.png", (230, 20, 20)), ("b.png", (20, 40, 220))):
+        path = tmp_path / name
+        path.write_bytes(name.encode())
+        images.append((str(path), rgb))
+
+    cache = ColorCache(cache_path)
+    for path, rgb in images:
+        cache.put(path, os.stat(path), "settings", rgb, "Red", [(rgb, 1.0)])
+    cache.close()
+    ColorIndex.from_cache(cache_path).save(index_path)
+
+    # Clear Cache, and one of the files is edited afterwards
+    cache = ColorCache(cache_path)
+    cache.invalidate()
+    cache.close()
+    with open(images[1][0], "ab") as f:
+        f.write(b"edited")
+
+    index = ColorIndex.from_cache(cache_path, previous=ColorIndex.load(index_path))
+    assert len(index) == 1
+    assert index.nearest((230, 20, 20), 5)[0][:2] == (images[0][0], (230, 20, 20))
+    assert len(ColorIndex.from_cache(cache_path)) == 0
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from core import (
+    ENGINES, LUT_MIN_ROWS, _classify_exact, classify_color, classify_color_indices, classify_colors, dominant_color,
+    select_center,
+)
+
+
+def test_select_center_skips_empty_clusters():
+    # Two populated gray clusters and an empty one whose stale center is saturated
+    centers = np.array([[120, 120, 120], [200, 200, 200], [230, 20, 20]])
+    counts = np.array([70, 30, 0])
+    assert select_center(centers, counts).tolist() == [120, 120, 120]
+    batch = select_center(centers[None], counts[None])
+    assert batch.tolist() == [[120, 120, 120]]
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_more_clusters_than_colors(tmp_path, engine):
+    # Two distinct colors, eight clusters: the result is one of the actual colors
+    pixels = np.zeros((50, 50, 3), dtype=np.uint8)
+    pixels[:36] = (128, 128, 128)
+    pixels[36:] = (40, 60, 200)
+    path = tmp_path / "two.png"
+    Image.fromarray(pixels).save(path)
+    color = dominant_color(str(path), n_clusters=8, engine=engine)
+    assert min(np.abs(color - ref).max() for ref in ((128, 128, 128), (40, 60, 200))) < 8
+
+
+def test_color_lut_matches_exact_rules_on_every_color():
+    # Every 8-bit color, one red plane at a time (large enough to go through the table)
+    g, b = np.meshgrid(np.arange(256), np.arange(256), indexing="ij")
+    plane = np.stack([np.zeros_like(g), g, b], axis=-1).reshape(-1, 3).astype(np.float64)
+    assert len(plane) >= LUT_MIN_ROWS
+    for r in range(256):
+        plane[:, 0] = r
+        assert np.array_equal(classify_color_indices(plane), _classify_exact(plane)), f"red = {r}"
+
+
+def test_classify_colors_matches_classify_color():
+    rng = np.random.default_rng(0)
+    rgb = np.concatenate([
+        rng.uniform(0, 255, (LUT_MIN_ROWS, 3)),
+        rng.integers(0, 256, (LUT_MIN_ROWS, 3)).astype(np.float64),
+    ])
+    expected = [classify_color(tuple(c)) for c in rgb]
+    assert classify_colors(rgb).tolist() == expected
+    assert classify_colors(rgb[:100]).tolist() == expected[:100]
@@ -0,0 +1,23 @@
+from dedup import DuplicateIndex, fingerprint
+
+
+def test_exact_duplicates_are_confirmed_byte_for_byte(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"same bytes")
+    (tmp_path / "b.png").write_bytes(b"same bytes")
+    index = DuplicateIndex(str(tmp_path))
+    key = fingerprint(str(tmp_path / "a.png"))
+
+    assert index.exact("a.png", key) is None
+    assert index.exact("b.png", key) == "a.png"
+    assert index.confirm("b.png", "a.png")
+    assert not index.confirm("a.png", None)
+
+
+def test_failed_comparison_is_not_a_duplicate(tmp_path):
+    # The file itself vanished between fingerprint and comparison
+    (tmp_path / "a.png").write_bytes(b"same bytes")
+    index = DuplicateIndex(str(tmp_path))
+    assert not index.confirm("b.png", "a.png")
+
+    # A representative moved away already is trusted on its fingerprint
+    assert index.confirm("a.png", "gone.png")
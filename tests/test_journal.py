@@ -0,0 +1,62 @@
+import os
+
+from PIL import Image
+
+from journal import Journal
+from pipeline import SortJob
+
+COLORS = {"Red": (230, 20, 20), "Green": (20, 200, 40), "Blue": (20, 40, 220)}
+
+
+def _job(src, out, journal_dir, files, **kwargs):
+    return SortJob(
+        str(src), str(out), True, files, ["All Colors"],
+        low_power_mode=True, max_workers=1, journal_dir=str(journal_dir), **kwargs
+    )
+
+
+def _journaled(journal_dir):
+    paths = [os.path.join(journal_dir, name) for name in os.listdir(journal_dir)]
+    assert len(paths) == 1
+    return Journal(paths[0]).load()
+
+
+def test_resume_after_stop_redoes_edited_files(tmp_path):
+    src, out, journal_dir = tmp_path / "in", tmp_path / "out", tmp_path / "journals"
+    src.mkdir()
+    for i in range(12):
+        name = list(COLORS)[i % 3]
+        Image.new("RGB", (64, 48), COLORS[name]).save(src / f"{i:02d}_{name}.png")
+    files = sorted(os.listdir(src))
+
+    # Stop once the first results are in
+    job = _job(src, out, journal_dir, files)
+    job.on_progress = lambda done, total: job.stop()
+    job.run()
+    done = _journaled(journal_dir)
+    assert done and set(done) <= set(files)
+
+    # One finished file is repainted before the run is resumed
+    edited = sorted(done)[0]
+    path = src / edited
+    Image.new("RGB", (64, 48), (250, 250, 250)).save(path)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    summary = _job(src, out, journal_dir, files).run()
+    assert summary["resumed"] == len(done) - 1
+    assert summary["placed"] == len(files)
+    assert os.path.exists(out / "White" / edited)
+    assert not os.listdir(journal_dir)
+
+
+def test_journal_round_trip(tmp_path):
+    journal = Journal(str(tmp_path / "job.jsonl"))
+    journal.open()
+    journal.record("a.png", "placed", "Red", ["Blue"], (10, 20))
+    journal.record("b.png", "skipped", None)
+    journal.close()
+    assert Journal(journal.path).load() == {
+        "a.png": ("placed", "Red", ["Blue"], (10, 20)),
+        "b.png": ("skipped", None, [], None),
+    }
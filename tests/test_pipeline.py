@@ -0,0 +1,34 @@
+import os
+
+import pytest
+from PIL import Image
+
+from pipeline import SortJob
+
+
+def _mixed_folder(folder):
+    """Three valid images and one corrupt JPEG."""
+    for name, color in (("red.png", (230, 20, 20)), ("green.png", (20, 200, 40)), ("blue.png", (20, 40, 220))):
+        Image.new("RGB", (64, 48), color).save(folder / name)
+    (folder / "broken.jpg").write_bytes(b"\xff\xd8\xff\xe0 not really a jpeg")
+    return sorted(os.listdir(folder))
+
+
+@pytest.mark.parametrize("staged", [False, True])
+def test_corrupt_file_does_not_fail_its_batch(tmp_path, staged):
+    src, out = tmp_path / "in", tmp_path / "out"
+    src.mkdir()
+    files = _mixed_folder(src)
+
+    summary = SortJob(
+        str(src), str(out), True, files, ["All Colors"],
+        low_power_mode=True, max_workers=1, staged=staged,
+    ).run()
+
+    assert summary["processed"] == 4
+    assert summary["failed"] + summary["skipped"] + summary["placed"] == 4
+    placed = {name for _, _, names in os.walk(out) for name in names}
+    assert {"red.png", "green.png", "blue.png"} <= placed
+    assert summary["classes"].get("Red") == 1
+    assert summary["classes"].get("Green") == 1
+    assert summary["classes"].get("Blue") == 1
@@ -0,0 +1,64 @@
+import os
+import errno
+
+import pytest
+
+import placement
+from placement import place
+
+
+@pytest.fixture
+def src(tmp_path, monkeypatch):
+    # Forget what earlier tests learned about unsupported methods
+    monkeypatch.setattr(placement, "_unsupported", set())
+    path = tmp_path / "in.png"
+    path.write_bytes(b"image bytes")
+    return path
+
+
+def _failing(monkeypatch, method, err, calls):
+    def fail(src, dst):
+        calls.append(method)
+        raise OSError(err, os.strerror(err), dst)
+
+    monkeypatch.setitem(placement._METHODS, method, fail)
+
+
+def test_hardlink_falls_back_to_reflink_then_copy(tmp_path, src, monkeypatch):
+    calls = []
+    _failing(monkeypatch, "hardlink", errno.EPERM, calls)
+    _failing(monkeypatch, "reflink", errno.EOPNOTSUPP, calls)
+
+    assert place(str(src), str(tmp_path / "a.png"), "hardlink") == "copy"
+    assert (tmp_path / "a.png").read_bytes() == b"image bytes"
+    assert calls == ["hardlink", "reflink"]
+
+    # The failures are remembered for this pair of filesystems
+    assert place(str(src), str(tmp_path / "b.png"), "hardlink") == "copy"
+    assert calls == ["hardlink", "reflink"]
+
+
+def test_hardlink_falls_back_to_reflink(tmp_path, src, monkeypatch):
+    calls = []
+    _failing(monkeypatch, "hardlink", errno.EXDEV, calls)
+    monkeypatch.setitem(placement._METHODS, "reflink", lambda s, d: calls.append("reflink") or os.link(s, d))
+
+    assert place(str(src), str(tmp_path / "a.png"), "hardlink") == "reflink"
+    assert calls == ["hardlink", "reflink"]
+
+
+def test_hardlink_on_the_same_filesystem(tmp_path, src):
+    dst = tmp_path / "a.png"
+    assert place(str(src), str(dst), "hardlink") == "hardlink"
+    assert os.path.samefile(src, dst)
+    # Placing it again finds the link from the previous run
+    assert place(str(src), str(dst), "hardlink") == "existing"
+
+
+def test_real_errors_are_not_swallowed(tmp_path, src, monkeypatch):
+    calls = []
+    _failing(monkeypatch, "reflink", errno.ENOSPC, calls)
+    with pytest.raises(OSError) as raised:
+        place(str(src), str(tmp_path / "a.png"), "reflink")
+    assert raised.value.errno == errno.ENOSPC
+    assert not (tmp_path / "a.png").exists()
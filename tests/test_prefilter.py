@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from core import ENGINES, classify_colors, colors_from_pixels
+from prefilter import plausible, reachable_classes
+
+
+def _samples(rng, n=60):
+    """Pixel samples from narrow hue clusters and desaturated mixes to noise."""
+    for _ in range(n):
+        base = rng.uniform(0, 255, 3)
+        spread = rng.choice([4.0, 20.0, 60.0, 255.0])
+        px = np.clip(base + rng.normal(0, spread, (400, 3)), 0, 255)
+        if rng.random() < 0.3:
+            # Pull part of the image towards gray
+            px[:200] = px[:200].mean(axis=1, keepdims=True)
+        yield px.astype(np.uint8)
+
+
+def test_reachable_classes_cover_every_subset_mean():
+    rng = np.random.default_rng(0)
+    for px in _samples(rng):
+        reachable = reachable_classes(px)
+        # Means of random subsets stand for any center a clusterer may return
+        masks = rng.random((300, len(px))) < rng.uniform(0.005, 0.9, (300, 1))
+        masks[~masks.any(axis=1), 0] = True
+        means = (masks @ px.astype(np.float64)) / masks.sum(axis=1, keepdims=True)
+        assert set(classify_colors(means)) <= reachable
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_strict_prefilter_keeps_every_image_the_analysis_places(engine):
+    rng = np.random.default_rng(1)
+    samples = list(_samples(rng, 40))
+    colors = colors_from_pixels(np.stack(samples), n_clusters=3, engine=engine)
+    for px, cls in zip(samples, classify_colors(colors)):
+        assert plausible(px, [cls], "strict")
@@ -0,0 +1,15 @@
+import pytest
+
+from bench.startup import ENTRY_POINTS, check_startup
+
+
+@pytest.fixture(scope="module")
+def report():
+    return check_startup(repeat=3)
+
+
+@pytest.mark.parametrize("entry_point", sorted(ENTRY_POINTS))
+def test_import_time_within_budget(report, entry_point):
+    result = report[entry_point]
+    assert not result["heavy"], f"{entry_point} imports {', '.join(result['heavy'])} at startup"
+    assert result["seconds"] <= result["budget"], result
@@ -1,21 +1,25 @@
 import os
-import time
 from PyQt6.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, 
+    QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, 
     QFileDialog, QProgressBar, QMessageBox, QCheckBox, QComboBox
 )
 from PyQt6.QtGui import QAction, QIcon 
-from PyQt6.QtCore import Qt, QTimer, QPropertyAnimation, QEasingCurve
+from PyQt6.QtCore import Qt, QPropertyAnimation, QEasingCurve
 from utils import HAS_ICONS
 if HAS_ICONS:
     import qtawesome as qta
 
 from ui.widgets import DragDropLabel, StayOpenMenu
-from workers import SortWorker, auto_low_power_mode
+from scanner import ScanSource
+from cache import ColorCache, default_cache_path
+from stats import default_report_path
+from journal import default_journal_dir
 
 class PrismPaperGUI(QWidget):
-    def __init__(self):
+    def __init__(self, pool=None):
         super().__init__()
+        # Long-lived worker processes reused by every run; see pool.WarmPool
+        self.pool = pool
         
         self.setWindowTitle("PrismPaper Logic") 
         self.setWindowOpacity(0.0)
@@ -55,12 +59,56 @@ class PrismPaperGUI(QWidget):
         self.copy_checkbox = QCheckBox(" Copy files (Safest option)")
         self.copy_checkbox.setChecked(True)
         settings_layout.addWidget(self.copy_checkbox)
+
+        # How copies are written; clones and links cost no extra disk space
+        self.placement_combo = QComboBox()
+        self.placement_combo.addItems(["Auto", "Full copy", "Hard link", "Symlink"])
+        self.placement_combo.setToolTip("Auto: instant copy-on-write clone where the filesystem supports it, full copy otherwise\nFull copy: always duplicate the file data\nHard link: no extra space, edits show up in both places (same drive only)\nSymlink: shortcut pointing at the original file")
+        self.copy_checkbox.toggled.connect(self.placement_combo.setEnabled)
+        settings_layout.addWidget(self.placement_combo)
+
+        self.cache_checkbox = QCheckBox(" Reuse cached colors")
+        self.cache_checkbox.setChecked(True)
+        self.cache_checkbox.setToolTip("Skip images already analysed with the same accuracy settings")
+        settings_layout.addWidget(self.cache_checkbox)
+
+        self.resume_checkbox = QCheckBox(" Resume unfinished run")
+        self.resume_checkbox.setChecked(True)
+        self.resume_checkbox.setToolTip("Skip files an interrupted or stopped run with the same folders and settings already sorted")
+        settings_layout.addWidget(self.resume_checkbox)
+
+        self.recursive_checkbox = QCheckBox(" Include subfolders")
+        self.recursive_checkbox.setToolTip("Scan nested folders too; the folder structure is kept in the output")
+        settings_layout.addWidget(self.recursive_checkbox)
+
+        self.staged_checkbox = QCheckBox(" Overlap disk I/O")
+        self.staged_checkbox.setToolTip("Read and write files on separate threads while images are clustered\nRecommended for network drives and spinning disks")
+        settings_layout.addWidget(self.staged_checkbox)
+
+        self.quick_filter_checkbox = QCheckBox(" Quick color filter")
+        self.quick_filter_checkbox.setToolTip("When sorting selected colors, also skip images with only a few pixels of those colors without analysing them\nMuch faster on large libraries, but may miss an image whose dominant color is a blend\nImages that cannot match are always skipped early")
+        settings_layout.addWidget(self.quick_filter_checkbox)
+
+        self.secondary_checkbox = QCheckBox(" Secondary colors")
+        self.secondary_checkbox.setToolTip("Also put an image in the folder of a second color covering at least a quarter of it")
+        settings_layout.addWidget(self.secondary_checkbox)
+
+        self.watch_checkbox = QCheckBox(" Watch folder")
+        self.watch_checkbox.setToolTip("Keep running after the folder is sorted and sort new images as they arrive\nPress Stop to end")
+        settings_layout.addWidget(self.watch_checkbox)
+
+        dup_label = QLabel("Duplicates:")
+        self.duplicates_combo = QComboBox()
+        self.duplicates_combo.addItems(["Off", "Keep", "Skip"])
+        self.duplicates_combo.setToolTip("Off: analyse every file\nKeep: analyse identical images once, sort every copy\nSkip: sort only the first copy of each image\nResized or re-encoded copies are detected with \"Overlap disk I/O\"")
+        settings_layout.addWidget(dup_label)
+        settings_layout.addWidget(self.duplicates_combo)
         
         # Performance mode selector
         mode_label = QLabel("Mode:")
         self.mode_combo = QComboBox()
         self.mode_combo.addItems(["Auto", "Performance", "Low Power"])
-        self.mode_combo.setToolTip("Auto: Detects based on system resources\nPerformance: Maximum speed\nLow Power: Minimal resource usage")
+        self.mode_combo.setToolTip("Auto: Detects based on system resources\nPerformance: Maximum speed\nLow Power: Minimal resource usage\nAuto and Performance adjust the number of workers to CPU, memory, disk and battery load while sorting")
         settings_layout.addWidget(mode_label)
         settings_layout.addWidget(self.mode_combo)
 
@@ -71,6 +119,14 @@ class PrismPaperGUI(QWidget):
         self.accuracy_combo.setToolTip("Normal: balanced speed/accuracy\nHigh: better accuracy, slower\nLow: faster, less accurate")
         settings_layout.addWidget(acc_label)
         settings_layout.addWidget(self.accuracy_combo)
+
+        # Clustering engine used by dominant_color
+        engine_label = QLabel("Engine:")
+        self.engine_combo = QComboBox()
+        self.engine_combo.addItems(["Auto", "Scikit-learn", "Batched", "Histogram"])
+        self.engine_combo.setToolTip("Auto: engine chosen by the accuracy preset\nScikit-learn: reference KMeans per image\nBatched: vectorized NumPy k-means, much lower per-image overhead\nHistogram: single-pass color quantization, fastest triage")
+        settings_layout.addWidget(engine_label)
+        settings_layout.addWidget(self.engine_combo)
         settings_layout.addStretch()
 
         color_label = QLabel("Colors:")
@@ -90,12 +146,14 @@ class PrismPaperGUI(QWidget):
         self.btn_start = QPushButton(" Start")
         self.btn_pause = QPushButton(" Pause")
         self.btn_stop = QPushButton(" Stop")
+        self.btn_clear_cache = QPushButton(" Clear Cache")
         self.btn_pause.setEnabled(False)
         self.btn_stop.setEnabled(False)
         
         button_layout.addWidget(self.btn_start)
         button_layout.addWidget(self.btn_pause)
         button_layout.addWidget(self.btn_stop)
+        button_layout.addWidget(self.btn_clear_cache)
         main_layout.addLayout(button_layout)
 
       
@@ -119,13 +177,8 @@ class PrismPaperGUI(QWidget):
         self.input_dir = ""
         self.output_dir = ""
         self.worker = None
+        self.watching = False
         self.is_paused = False
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_timer_display)
-        self.start_time = None
-        self.pause_timestamp = None
-        self.total_files_count = 0
-        self.processed_files_count = 0
 
     def setup_color_menu(self):
         self.color_options = ["Red", "Orange", "Yellow", "Green", "Cyan", "Blue", "Purple", "Pink", "Black", "White", "Gray", "Mixed"]
@@ -151,6 +204,7 @@ class PrismPaperGUI(QWidget):
             self.btn_start.setIcon(qta.icon('fa5s.play', color='white'))
             self.btn_pause.setIcon(qta.icon('fa5s.pause', color='white'))
             self.btn_stop.setIcon(qta.icon('fa5s.stop', color='white'))
+            self.btn_clear_cache.setIcon(qta.icon('fa5s.trash', color='white'))
             self.copy_checkbox.setIcon(qta.icon('fa5s.copy', color='#aaa'))
 
         self.setStyleSheet("""
@@ -190,6 +244,15 @@ class PrismPaperGUI(QWidget):
         self.btn_start.clicked.connect(self.start_sorting)
         self.btn_pause.clicked.connect(self.toggle_pause)
         self.btn_stop.clicked.connect(self.cancel_sorting)
+        self.btn_clear_cache.clicked.connect(self.clear_cache)
+        self.mode_combo.currentTextChanged.connect(self.on_mode_changed)
+
+    def on_mode_changed(self, text):
+        # Resize the warm pool now rather than when the next run starts
+        if self.pool is None or (self.worker and self.worker.isRunning()):
+            return
+        from controller import worker_bounds
+        self.pool.start(worker_bounds(text == "Low Power")[1])
 
     def on_all_colors_toggled(self, checked):
         if checked:
@@ -253,36 +316,39 @@ class PrismPaperGUI(QWidget):
         self.check_folders_ready()
 
     def start_sorting(self):
+        # The sorting engine pulls in NumPy and Pillow; keep it off the startup path
+        from workers import SortWorker
+        from pipeline import accuracy_settings_for
+
         if not self.input_dir or not self.output_dir:
             QMessageBox.warning(self, "Missing Info", "Please select both folders.")
             return
         
-        self.status_label.setText("Scanning files...")
-        QApplication.processEvents()
-        files_list = [f for f in os.listdir(self.input_dir) if f.lower().endswith((".png", ".jpg", ".jpeg", ".webp"))]
-        self.total_files_count = len(files_list)
-        self.processed_files_count = 0
-        
-        if self.total_files_count == 0:
-             QMessageBox.warning(self, "No Files", "No supported images found in input folder.")
-             self.check_folders_ready()
-             return
+        # Files are discovered in the background while the first ones are already processed
+        self.watching = self.watch_checkbox.isChecked()
+        if self.watching:
+            from watcher import WatchSource
+            files = WatchSource(self.input_dir, recursive=self.recursive_checkbox.isChecked(), skip_dirs=[self.output_dir])
+        else:
+            files = ScanSource(self.input_dir, recursive=self.recursive_checkbox.isChecked(), skip_dirs=[self.output_dir])
 
         self.btn_start.setEnabled(False)
         self.input_button.setEnabled(False)
         self.output_button.setEnabled(False)
+        self.btn_clear_cache.setEnabled(False)
         self.btn_pause.setEnabled(True)
         self.btn_stop.setEnabled(True)
         self.is_paused = False
         self.update_pause_btn_text()
-        self.status_label.setText("Processing...")
+        self.status_label.setText("Watching for new images..." if self.watching else "Processing...")
         self.status_label.setStyleSheet("color: #3a86ff; font-size: 10pt; margin-top: 5px; font-weight: bold;")
 
-        self.start_time = time.time()
-        self.pause_timestamp = None
-        self.timer.start(1000)
-
         copy_mode = self.copy_checkbox.isChecked()
+        placements = { 'Auto': 'auto', 'Full copy': 'copy', 'Hard link': 'hardlink', 'Symlink': 'symlink' }
+        placement = placements[self.placement_combo.currentText()]
+        duplicates = { 'Off': None, 'Keep': 'report', 'Skip': 'skip' }[self.duplicates_combo.currentText()]
+        prefilter = 'fast' if self.quick_filter_checkbox.isChecked() else 'strict'
+        secondary = 'place' if self.secondary_checkbox.isChecked() else None
         target_colors = self.get_selected_colors()
         
       
@@ -296,46 +362,50 @@ class PrismPaperGUI(QWidget):
 
         # Build accuracy settings from dropdown
         acc = self.accuracy_combo.currentText() if hasattr(self, 'accuracy_combo') else 'Normal'
-        if acc == 'High':
-            accuracy_settings = { 'sample_size': 100, 'n_clusters': 5, 'n_init': 3, 'max_iter': 200, 's_threshold': 0.20, 'v_threshold': 0.20 }
-        elif acc == 'Low':
-            accuracy_settings = { 'sample_size': 30, 'n_clusters': 2, 'n_init': 1, 'max_iter': 50, 's_threshold': 0.15, 'v_threshold': 0.15 }
-        else:
-            accuracy_settings = { 'sample_size': 50, 'n_clusters': 3, 'n_init': 1, 'max_iter': 100, 's_threshold': 0.25, 'v_threshold': 0.25 }
+        engines = { 'Scikit-learn': 'sklearn', 'Batched': 'batched', 'Histogram': 'histogram' }
+        accuracy_settings = accuracy_settings_for(acc, engines.get(self.engine_combo.currentText()))
+
+        cache_path = default_cache_path() if self.cache_checkbox.isChecked() else None
 
-        self.worker = SortWorker(self.input_dir, self.output_dir, copy_mode, files_list, target_colors, low_power_mode=low_power, accuracy_settings=accuracy_settings)
-        self.worker.progress.connect(self.progress.setValue)
-        self.worker.counter_update.connect(self.update_counter_vars)
+        self.worker = SortWorker(self.input_dir, self.output_dir, copy_mode, files, target_colors, low_power_mode=low_power, accuracy_settings=accuracy_settings, cache_path=cache_path, staged=self.staged_checkbox.isChecked(), placement=placement, duplicates=duplicates, prefilter=prefilter, secondary=secondary, report_path=default_report_path(), journal_dir=default_journal_dir(), resume=self.resume_checkbox.isChecked(), pool=self.pool)
+        self.worker.progress.connect(self.update_progress)
         self.worker.status_msg.connect(self.update_status_label)
+        self.worker.stats_update.connect(self.update_stats)
         self.worker.finished.connect(self.on_finished)
         self.worker.start()
 
-    def update_timer_display(self):
-        if self.start_time is None or self.is_paused: return
-        elapsed = time.time() - self.start_time
-        m, s = divmod(int(elapsed), 60)
+    def clear_cache(self):
+        try:
+            cache = ColorCache(default_cache_path())
+            cache.invalidate()
+            cache.close()
+        except Exception as e:
+            QMessageBox.warning(self, "Cache", f"Could not clear the color cache: {e}")
+            return
+        self.status_label.setText("Color cache cleared")
+
+    def update_progress(self, snapshot):
+        # Sent by the worker a few times a second, not per file
+        self.progress.setValue(snapshot["percent"])
+        m, s = divmod(int(snapshot["elapsed"]), 60)
         elapsed_str = f"{m:02d}:{s:02d}"
-        
+
         remaining_str = "--:--"
-        if self.processed_files_count > 0 and elapsed > 0:
-            rate = self.processed_files_count / elapsed
-            remaining_items = self.total_files_count - self.processed_files_count
-            if rate > 0:
-                rm, rs = divmod(int(remaining_items / rate), 60)
-                remaining_str = f"{rm:02d}:{rs:02d}"
+        if snapshot["eta"] is not None:
+            rm, rs = divmod(int(snapshot["eta"]), 60)
+            remaining_str = f"{rm:02d}:{rs:02d}"
 
-        self.stats_label.setText(f"Processed: {self.processed_files_count} / {self.total_files_count}  |  Elapsed: {elapsed_str}  |  Remaining: {remaining_str}")
+        self.stats_label.setText(f"Processed: {snapshot['processed']} / {snapshot['total']}  |  {snapshot['rate']:.1f} files/s  |  Elapsed: {elapsed_str}  |  Remaining: {remaining_str}")
+        # Images per color so far, shown when hovering the counters
+        classes = sorted(snapshot.get("classes", {}).items(), key=lambda item: -item[1])
+        self.stats_label.setToolTip("\n".join(f"{name}: {count}" for name, count in classes))
 
     def toggle_pause(self):
         if not self.worker: return
         if self.is_paused:
-            self.start_time += (time.time() - self.pause_timestamp)
             self.worker.resume()
-            self.timer.start()
             self.is_paused = False
         else:
-            self.timer.stop()
-            self.pause_timestamp = time.time()
             self.worker.pause()
             self.is_paused = True
         self.update_pause_btn_text()
@@ -353,9 +423,14 @@ class PrismPaperGUI(QWidget):
             self.status_label.setText("Stopping...")
             self.status_label.setStyleSheet("color: #e63946; font-size: 10pt; margin-top: 5px; font-weight: bold;")
 
-    def update_counter_vars(self, processed, total):
-        self.processed_files_count = processed
-        self.total_files_count = total 
+    def update_stats(self, stats):
+        # Median and tail time per stage, shown when hovering the progress bar
+        lines = [
+            f"{stage}: {s['p50'] * 1000:.1f} ms median, {s['p95'] * 1000:.1f} ms p95"
+            for stage, s in stats["stages"].items() if s["count"]
+        ]
+        lines.append(f"Read {stats['bytes_read'] / 1e6:.0f} MB, wrote {stats['bytes_written'] / 1e6:.0f} MB")
+        self.progress.setToolTip("\n".join(lines))
 
     def update_status_label(self, msg):
         self.status_label.setText(msg)
@@ -363,15 +438,23 @@ class PrismPaperGUI(QWidget):
         self.status_label.setStyleSheet(f"color: {color}; font-size: 10pt; margin-top: 5px; font-weight: bold;")
 
     def on_finished(self):
-        self.timer.stop()
         self.btn_start.setEnabled(True)
         self.input_button.setEnabled(True)
         self.output_button.setEnabled(True)
+        self.btn_clear_cache.setEnabled(True)
         self.btn_pause.setEnabled(False)
         self.btn_stop.setEnabled(False)
         self.is_paused = False
         self.update_pause_btn_text()
-        QMessageBox.information(self, "Done", "Sorting complete or stopped!")
+        summary = self.worker.summary if self.worker else None
+        if summary is not None and summary["total"] == 0 and not self.watching:
+            QMessageBox.warning(self, "No Files", "No supported images found in input folder.")
+            self.check_folders_ready()
+            return
+        message = "Sorting complete or stopped!"
+        if summary and summary["duplicates"]:
+            message += f"\n{len(summary['duplicates'])} duplicate image(s) found."
+        QMessageBox.information(self, "Done", message)
         self.status_label.setText("Complete")
         self.status_label.setStyleSheet("color: #4caf50; font-size: 10pt; margin-top: 5px; font-weight: bold;")
         self.progress.setValue(0)
\ No newline at end of file
@@ -1,4 +1,3 @@
-import time
 from PyQt6.QtWidgets import (
     QSplashScreen, QProgressBar, QVBoxLayout, 
     QLabel, QWidget, QGraphicsDropShadowEffect,
@@ -85,16 +84,4 @@ class ModernSplashScreen(QSplashScreen):
     def progress_update(self, value, text):
         self.progress.setValue(value)
         self.status_label.setText(text)
-        QApplication.processEvents()
-
-    def smooth_progress(self, target_value, duration=0.5):
-        current = self.progress.value()
-        steps = 30 
-        increment = (target_value - current) / steps
-        pause = duration / steps
-
-        for _ in range(steps):
-            current += increment
-            self.progress.setValue(int(current))
-            QApplication.processEvents() 
-            time.sleep(pause)
\ No newline at end of file
+        QApplication.processEvents()
\ No newline at end of file
@@ -0,0 +1,266 @@
+"""Watch-folder source: keeps a SortJob fed with images as they arrive."""
+import os
+import sys
+import time
+import errno
+import ctypes
+import select
+import struct
+import threading
+
+from scanner import SUPPORTED_EXTENSIONS, ScanSource, _matches, scan_images
+
+DEBOUNCE_SECONDS = 0.5  # quiet time after a file was closed or moved in
+SETTLE_SECONDS = 2.0  # quiet time for files that were only created or written to
+POLL_SECONDS = 1.0  # listing interval without inotify
+
+# inotify(7)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (
+    IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+_EVENT = struct.Struct("iIII")
+
+
+def _inotify():
+    """libc with inotify, or None where it is not available."""
+    if not sys.platform.startswith("linux"):
+        return None
+    # Imported here: find_library may run external tools, only needed on Linux
+    import ctypes.util
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class WatchSource(ScanSource):
+    """A ScanSource that never completes: after the initial scan it keeps
+    handing out images that appear in (or are rewritten in) `root`.
+
+    Uses inotify on Linux and lists the folder every POLL_SECONDS elsewhere,
+    or when inotify runs out of watches. A file is handed out once it has
+    been quiet for DEBOUNCE_SECONDS after being closed or moved in, or for
+    SETTLE_SECONDS after anything else, so half-written downloads are not
+    picked up; a file is handed out again only when its size or mtime
+    changed. stop() ends the watch, after which the source is exhausted.
+    `ready` is set once the watch is set up, and `polling` tells how.
+
+    A watch never completes, so its runs keep no progress journal.
+    """
+
+    journaled = False
+
+    def __init__(self, root, recursive=True, include=None, exclude=None, skip_dirs=(), poll=False):
+        super().__init__(root, recursive, include, exclude, skip_dirs)
+        self.poll = poll
+        self.polling = poll
+        self._skip = {os.path.normcase(os.path.abspath(d)) for d in skip_dirs if d}
+        self._handed = {}  # relative path -> (size, mtime_ns) when handed out
+        self._due = {}  # relative path -> time it is considered finished
+        self._wake_r = self._wake_w = None
+        self.ready = threading.Event()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="prismpaper-watch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        with self._cond:
+            self._cond.notify_all()
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b"\0")
+            except OSError:
+                pass
+
+    def _run(self):
+        try:
+            libc = None if self.poll else _inotify()
+            if libc is not None:
+                try:
+                    self._watch_inotify(libc)
+                except OSError:
+                    # Typically out of inotify watches (fs.inotify.max_user_watches)
+                    self.polling = True
+            else:
+                self.polling = True
+            if self.polling and not self._stopped:
+                self._watch_polling()
+        finally:
+            self.ready.set()
+            with self._cond:
+                self.complete = True
+                self._cond.notify_all()
+
+    # ---------- HAND OUT ----------
+    def _wanted(self, rel):
+        name = os.path.basename(rel)
+        if not name.lower().endswith(SUPPORTED_EXTENSIONS):
+            return False
+        if self.include and not _matches(rel, name, self.include):
+            return False
+        return not (self.exclude and _matches(rel, name, self.exclude))
+
+    def _release(self, rel):
+        """Queue `rel` unless it is gone, empty or unchanged since it was handed out."""
+        try:
+            st = os.stat(os.path.join(self.root, rel))
+        except OSError:
+            return
+        signature = (st.st_size, st.st_mtime_ns)
+        if not st.st_size or self._handed.get(rel) == signature:
+            return
+        self._handed[rel] = signature
+        with self._cond:
+            self._items.append(rel)
+            self.count += 1
+            self._cond.notify()
+
+    def _release_due(self):
+        """Queue the files whose quiet time is over; seconds until the next one is, or None."""
+        now = time.monotonic()
+        for rel, due in list(self._due.items()):
+            if due <= now:
+                del self._due[rel]
+                self._release(rel)
+        return max(0.0, min(self._due.values()) - now) if self._due else None
+
+    # ---------- INOTIFY ----------
+    def _watch_inotify(self, libc):
+        fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._wake_r, self._wake_w = os.pipe()
+        watches = {}
+        try:
+            self._add_tree(libc, fd, watches, "", initial=True)
+            self.ready.set()
+            while not self._stopped:
+                ready, _, _ = select.select([fd, self._wake_r], [], [], self._release_due())
+                if self._wake_r in ready:
+                    break
+                if fd in ready:
+                    self._read_events(libc, fd, watches)
+        finally:
+            os.close(fd)
+            for end in (self._wake_r, self._wake_w):
+                os.close(end)
+            self._wake_r = self._wake_w = None
+
+    def _add_tree(self, libc, fd, watches, rel_dir, initial=False):
+        """Watch `rel_dir` (and its sub-folders when recursive) and pick up the images already in it."""
+        dirs = [rel_dir]
+        while dirs:
+            current = dirs.pop()
+            wd = libc.inotify_add_watch(fd, os.fsencode(os.path.join(self.root, current)), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                    continue
+                raise OSError(err, os.strerror(err))
+            watches[wd] = current
+            if not self.recursive:
+                break
+            try:
+                with os.scandir(os.path.join(self.root, current)) as listing:
+                    for entry in listing:
+                        rel = os.path.join(current, entry.name) if current else entry.name
+                        if entry.is_dir(follow_symlinks=False) and self._descend(rel):
+                            dirs.append(rel)
+            except OSError:
+                pass
+
+        # Files that were already there, or moved in with their folder
+        if initial:
+            for rel in scan_images(self.root, self.recursive, self.include, self.exclude, self.skip_dirs):
+                self._release(rel)
+            return
+        now = time.monotonic()
+        for rel in scan_images(os.path.join(self.root, rel_dir), self.recursive, None, None, self.skip_dirs):
+            rel = os.path.join(rel_dir, rel)
+            if self._wanted(rel):
+                self._due[rel] = now + DEBOUNCE_SECONDS
+
+    def _descend(self, rel):
+        """Whether the folder `rel` is watched: not the output or another skipped or excluded folder."""
+        if os.path.normcase(os.path.abspath(os.path.join(self.root, rel))) in self._skip:
+            return False
+        return not (self.exclude and _matches(rel, os.path.basename(rel), self.exclude))
+
+    def _read_events(self, libc, fd, watches):
+        try:
+            data = os.read(fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        now = time.monotonic()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0"))
+            offset += _EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost: look at everything again, unchanged files are not handed out twice
+                for rel in scan_images(self.root, self.recursive, self.include, self.exclude, self.skip_dirs):
+                    self._due.setdefault(rel, now + DEBOUNCE_SECONDS)
+                continue
+            if mask & IN_IGNORED:
+                watches.pop(wd, None)
+                continue
+            rel_dir = watches.get(wd)
+            if rel_dir is None or not name:
+                continue
+            rel = os.path.join(rel_dir, name) if rel_dir else name
+
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO) and self._descend(rel):
+                    self._add_tree(libc, fd, watches, rel)
+                continue
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                self._due.pop(rel, None)
+                self._handed.pop(rel, None)
+            elif self._wanted(rel):
+                quiet = DEBOUNCE_SECONDS if mask & (IN_CLOSE_WRITE | IN_MOVED_TO) else SETTLE_SECONDS
+                self._due[rel] = now + quiet
+
+    # ---------- POLLING ----------
+    def _watch_polling(self):
+        previous = None
+        self.ready.set()
+        while not self._stopped:
+            seen = {}
+            for rel in scan_images(self.root, self.recursive, self.include, self.exclude, self.skip_dirs):
+                try:
+                    st = os.stat(os.path.join(self.root, rel))
+                except OSError:
+                    continue
+                seen[rel] = (st.st_size, st.st_mtime_ns)
+
+            for rel, signature in seen.items():
+                # Unchanged over a whole interval counts as finished; the first listing is taken as is
+                if previous is None or previous.get(rel) == signature:
+                    self._release(rel)
+            for rel in set(self._handed) - set(seen):
+                del self._handed[rel]
+            previous = seen
+
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopped, POLL_SECONDS)
@@ -1,63 +1,26 @@
-import os
-import shutil
-import concurrent.futures
-import multiprocessing
-import psutil
+import time
+import threading
 from PyQt6.QtCore import QThread, pyqtSignal, QMutex, QWaitCondition
-from core import dominant_color, classify_color
+from pipeline import SortJob
+from stats import ProgressMeter
 
-# --------------------- PROCESS WORKER ---------------------
-def process_file_worker(args):
-    """Runs in a separate process"""
-    input_dir, output_dir, copy_mode, target_colors, filename, accuracy_settings = args
-    src = os.path.join(input_dir, filename)
-
-    try:
-        color = dominant_color(src, **(accuracy_settings or {}))
-    except TypeError:
-        color = dominant_color(src)
-
-    folder_name = classify_color(color)
-
-    if "All Colors" not in target_colors and folder_name not in target_colors:
-        return (filename, False, None)
-
-    dst_dir = os.path.join(output_dir, folder_name)
-    os.makedirs(dst_dir, exist_ok=True)
-
-    try:
-        dst_file = os.path.join(dst_dir, filename)
-        if copy_mode:
-            shutil.copy2(src, dst_file)
-        else:
-            shutil.move(src, dst_file)
-        return (filename, True, folder_name)
-    except Exception as e:
-        return (filename, False, str(e))
-
-
-# --------------------- LOW POWER AUTO-DETECT ---------------------
-def auto_low_power_mode():
-    cpu_count = multiprocessing.cpu_count()
-    ram_gb = psutil.virtual_memory().total / (1024**3)
-
-    if cpu_count <= 2:
-        return True
-    if ram_gb <= 4:
-        return True
-    battery = psutil.sensors_battery()
-    if battery and not battery.power_plugged:
-        return True
-
-    return False
+PROGRESS_INTERVAL = 0.1  # at most ten progress snapshots per second
+CLOCK_INTERVAL = 1.0  # snapshots while no file finishes, to keep the elapsed time moving
 
 
 # --------------------- SORT WORKER THREAD ---------------------
 class SortWorker(QThread):
-    progress = pyqtSignal(int)
-    counter_update = pyqtSignal(int, int)
+    """Runs a SortJob off the GUI thread.
+
+    Progress goes out as `progress` snapshots (see stats.ProgressMeter):
+    counts, per-class tallies, throughput and time left, sent at most every
+    PROGRESS_INTERVAL from a ticker thread rather than once per file.
+    """
+
+    progress = pyqtSignal(dict)
     finished = pyqtSignal()
     status_msg = pyqtSignal(str)
+    stats_update = pyqtSignal(dict)
 
     def __init__(
         self,
@@ -68,6 +31,17 @@ class SortWorker(QThread):
         target_colors,
         low_power_mode=None,
         accuracy_settings=None,
+        cache_path=None,
+        mirror=True,
+        staged=False,
+        placement=None,
+        duplicates=None,
+        prefilter=None,
+        secondary=None,
+        report_path=None,
+        journal_dir=None,
+        resume=True,
+        pool=None,
     ):
         super().__init__()
         self.input_dir = input_dir
@@ -76,13 +50,26 @@ class SortWorker(QThread):
         self.files_list = files_list
         self.target_colors = target_colors
 
-        # Auto-detect low-power if not explicitly set
-        self.low_power_mode = (
-            auto_low_power_mode() if low_power_mode is None else low_power_mode
-        )
+        # None is resolved by the job, which lets an auto-detected low-power start grow
+        self.low_power_mode = low_power_mode
 
         self.accuracy_settings = accuracy_settings or {}
-
+        self.cache_path = cache_path
+        self.mirror = mirror
+        self.staged = staged
+        self.placement = placement
+        self.duplicates = duplicates
+        self.prefilter = prefilter
+        self.secondary = secondary
+        self.report_path = report_path
+        self.journal_dir = journal_dir
+        self.resume_journal = resume
+        self.pool = pool
+        self.summary = None
+
+        self._meter = ProgressMeter()
+        self._ticker_stop = threading.Event()
+        self._job = None
         self._running = True
         self._paused = False
         self._mutex = QMutex()
@@ -93,6 +80,10 @@ class SortWorker(QThread):
         self._mutex.lock()
         self._paused = True
         self._mutex.unlock()
+        self._meter.pause()
+        # Worker processes stop between two files, not only the result consumer
+        if self._job:
+            self._job.pause()
         self.status_msg.emit("Paused")
 
     def resume(self):
@@ -100,10 +91,15 @@ class SortWorker(QThread):
         self._paused = False
         self._wait_condition.wakeAll()
         self._mutex.unlock()
+        self._meter.resume()
+        if self._job:
+            self._job.resume()
         self.status_msg.emit("Processing...")
 
     def stop(self):
         self._running = False
+        if self._job:
+            self._job.stop()
         self.resume()
 
     def _wait_if_paused(self):
@@ -114,68 +110,65 @@ class SortWorker(QThread):
 
     # ---------- THREAD RUN ----------
     def run(self):
-        total = len(self.files_list)
-        processed = 0
-
-        if total == 0:
-            self.finished.emit()
-            return
-
-        cpu_count = multiprocessing.cpu_count()
-        max_workers = 1 if self.low_power_mode else max(1, min(cpu_count - 1, 4))
-        chunk_size = 10 if self.low_power_mode else 25
-
-        self.status_msg.emit(
-            f"Mode: {'Low Power' if self.low_power_mode else 'Performance'} | Workers: {max_workers}"
-        )
-
-        args_iter = (
-            (self.input_dir, self.output_dir, self.copy_mode, self.target_colors, f, self.accuracy_settings)
-            for f in self.files_list
+        self._job = SortJob(
+            self.input_dir,
+            self.output_dir,
+            self.copy_mode,
+            self.files_list,
+            self.target_colors,
+            low_power_mode=self.low_power_mode,
+            accuracy_settings=self.accuracy_settings,
+            cache_path=self.cache_path,
+            mirror=self.mirror,
+            staged=self.staged,
+            placement=self.placement,
+            duplicates=self.duplicates,
+            prefilter=self.prefilter,
+            secondary=self.secondary,
+            report_path=self.report_path,
+            journal_dir=self.journal_dir,
+            resume=self.resume_journal,
+            pool=self.pool,
+            on_progress=self._track_progress,
+            on_status=self.status_msg.emit,
+            on_stats=self.stats_update.emit,
+            checkpoint=self._wait_if_paused,
         )
-
-        try:
-            with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
-                futures = []
-
-                for args in args_iter:
-                    if not self._running:
-                        break
-                    futures.append(executor.submit(process_file_worker, args))
-
-                    if len(futures) >= chunk_size:
-                        processed += self._process_futures(futures, total, processed)
-                        futures.clear()
-
-                # Process any remaining futures
-                if futures:
-                    processed += self._process_futures(futures, total, processed)
-
-        except Exception as e:
-            self.status_msg.emit(f"Worker error: {e}")
-
-        self.finished.emit()
-
-    # ---------- HELPER ----------
-    def _process_futures(self, futures, total, processed):
-        processed_count = 0
-        for future in concurrent.futures.as_completed(futures):
-            if not self._running:
-                break
-
-            self._wait_if_paused()
-
+        if self._paused:
+            self._job.pause()
+        if self._running:
+            ticker = threading.Thread(target=self._tick, name="prismpaper-progress", daemon=True)
+            ticker.start()
             try:
-                _, success, _ = future.result()
-            except Exception:
-                success = False
+                self.summary = self._job.run()
+            finally:
+                self._ticker_stop.set()
+                ticker.join()
+            # The final numbers, whatever the ticker sent last
+            self._meter.update(self.summary["processed"], self.summary["total"], self._counts())
+            self.progress.emit(self._meter.snapshot())
 
-            processed += 1
-            processed_count += 1
-            self.progress.emit(int(processed / total * 100))
-            self.counter_update.emit(processed, total)
+        self.finished.emit()
 
-        return processed_count
+    # ---------- PROGRESS ----------
+    def _track_progress(self, processed, total):
+        # Called from the job's thread for every file: only noted here, _tick() sends it
+        self._meter.update(processed, total, self._counts())
+
+    def _counts(self):
+        summary = self._job.summary
+        counts = {key: summary[key] for key in ("placed", "skipped", "failed")}
+        counts["classes"] = dict(summary["classes"])
+        return counts
+
+    def _tick(self):
+        sent, version = 0.0, None
+        while not self._ticker_stop.wait(PROGRESS_INTERVAL):
+            now = time.monotonic()
+            if self._meter.version != version or (not self._paused and now - sent >= CLOCK_INTERVAL):
+                version = self._meter.version
+                sent = now
+                self.progress.emit(self._meter.snapshot())
 
 
 # --------------------- PYINSTALLER FREEZE SUPPORT ---------------------